@@ -0,0 +1,27 @@
+from core.models import UserChapter, UserLesson
+
+
+
+# Lesson sidebar
+# ----------------------------------------------------------------------------------------------------------------------
+# [(user_chapter, [user_lesson, ...]), ...] in curriculum order, from two queries.
+# user_lesson.lesson carries title, type, max_rating and total_duration.
+def build_sidebar(user_subject):
+    user_lessons_by_chapter = {}
+    for ul in (
+        UserLesson.objects.filter(user_subject=user_subject)
+        .select_related('lesson')
+        .only(
+            'id', 'user_subject_id', 'lesson_id', 'rating', 'status',
+            'lesson__chapter_id', 'lesson__title', 'lesson__lesson_type', 'lesson__max_rating',
+            'lesson__total_duration', 'lesson__order',
+        )
+        .order_by('lesson__order', 'lesson_id')
+    ):
+        user_lessons_by_chapter.setdefault(ul.lesson.chapter_id, []).append(ul)
+
+    return [
+        (uc, user_lessons_by_chapter.get(uc.chapter_id, []))
+        for uc in UserChapter.objects.filter(user_subject=user_subject).select_related('chapter').order_by('chapter__order')
+    ]
+
@@ -1,5 +1,10 @@
+from functools import lru_cache, partial
 from django.contrib import messages
-from core.models import Option, TableCell
+from django.db import transaction
+from core.models import Option, UserVideo, UserTextGap, UserAnswer, UserMatchingAnswer, UserTableAnswer
+from core.grading import CORRECT, ONE_ERROR, PARTIAL, WRONG, grade
+from core.utils.answer_keys import get_answer_key
+from core.utils.revisions import bump_revision
 
 
 def get_related_data(user_task):
@@ -8,36 +13,90 @@ def get_related_data(user_task):
         'video': lambda ut: {'user_videos': ut.user_videos.all()},
         'written': lambda ut: {'user_written': ut.user_written.all()},
         'text_gap': lambda ut: {'user_text_gaps': ut.user_text_gaps.all()},
-        'test': lambda ut: {'user_answers': ut.user_options.all()},
-        'matching': lambda ut: {'user_matchings': ut.matching_answers.all()},
-        'table': build_table_context,
+        # Built only when the cached test / matching / table fragment is missing
+        'test': lambda ut: {'user_answers': partial(build_test_answers, ut)},
+        'matching': lambda ut: {'matching_board': partial(build_matching_board, ut)},
+        'table': get_table_context,
     }
     builder = BUILDERS.get(task_type, lambda ut: {})
     return builder(user_task)
 
 
-def build_table_context(user_task):
-    rows = user_task.task.table_rows.order_by('order')
-    columns = user_task.task.table_columns.order_by('order')
-    answers = user_task.user_table_answers.select_related('row', 'column')
+# Header and body are separate fragments, the columns are read once for both of them
+def get_table_context(user_task):
+    get_columns = lru_cache(maxsize=None)(partial(get_table_columns, user_task))
+    return {
+        'table_columns': get_columns,
+        'table_board': partial(build_table_board, user_task, get_columns),
+    }
+
+
+def get_table_columns(user_task):
+    return list(user_task.task.table_columns.order_by('order'))
+
+
+# Table body: rows, columns and the {row_id: {column_id: ...}} matrices of the UserTableAnswers and of the answer key
+def build_table_board(user_task, get_columns):
+    rows = list(user_task.task.table_rows.order_by('order'))
 
     answer_matrix = {row.id: {} for row in rows}
-    for a in answers:
+    for a in user_task.user_table_answers.all():
         answer_matrix[a.row_id][a.column_id] = a
 
-    correct_cells = TableCell.objects.filter(row__task=user_task.task)
     correct_matrix = {row.id: {} for row in rows}
-    for cell in correct_cells:
-        correct_matrix[cell.row_id][cell.column_id] = cell.correct
+    for (row_id, column_id), correct in get_answer_key(user_task.task).items():
+        correct_matrix[row_id][column_id] = correct
 
     return {
-        'table_rows': rows,
-        'table_columns': columns,
+        'rows': rows,
+        'columns': get_columns(),
         'answer_matrix': answer_matrix,
         'correct_matrix': correct_matrix,
     }
 
 
+# Test answers: UserAnswers with their question, question options and selected option ids, from three queries.
+# ua.question_options is the list of options, ua.selected_ids a frozenset of the selected option ids.
+def build_test_answers(user_task):
+    answers = list(user_task.user_options.select_related('question').order_by('id'))
+
+    options = {}
+    for option in Option.objects.filter(question_id__in={ua.question_id for ua in answers}).order_by('id'):
+        options.setdefault(option.question_id, []).append(option)
+
+    selected = {}
+    for answer_id, option_id in (
+        UserAnswer.options.through.objects.filter(useranswer__in=answers).values_list('useranswer_id', 'option_id')
+    ):
+        selected.setdefault(answer_id, set()).add(option_id)
+
+    for ua in answers:
+        ua.question_options = options.get(ua.question_id, [])
+        ua.selected_ids = frozenset(selected.get(ua.id, ()))
+    return answers
+
+
+# Matching board: columns with the answers placed in them and the pool of unplaced answers, from two queries.
+# answer.correct_label is the label of the item's correct column.
+def build_matching_board(user_task):
+    columns = list(user_task.task.columns.order_by('order', 'id'))
+    labels = {column.id: column.label for column in columns}
+    placed = {column.id: [] for column in columns}
+    pool = []
+
+    for answer in user_task.matching_answers.select_related('item').order_by('id'):
+        answer.correct_label = labels.get(answer.item.correct_column_id)
+        if answer.selected_column_id is None:
+            pool.append(answer)
+        elif answer.selected_column_id in placed:
+            placed[answer.selected_column_id].append(answer)
+
+    return {
+        'columns': [(column, placed[column.id]) for column in columns],
+        'pool': pool,
+    }
+
+
 def handle_post_request(request, user_task):
     task_type = user_task.task.task_type
     HANDLERS = {
@@ -50,20 +109,23 @@ def handle_post_request(request, user_task):
     }
     handler = HANDLERS.get(task_type)
     if handler:
-        handler(request, user_task)
+        with transaction.atomic():
+            handler(request, user_task)
+        # Cached fragments of the task (apps.dashboard.student.templatetags.fragments) show the submitted answers
+        bump_revision('user_task', user_task.pk)
 
 
 # ---------------- video ----------------
 def handle_video(request, user_task):
-    videos = user_task.user_videos.all()
+    videos = list(user_task.user_videos.all())
     for uv in videos:
         uv.watched_seconds = int(request.POST.get(f'watched_{uv.id}', 0))
         uv.is_completed = True
-        uv.save()
-    if all(uv.is_completed for uv in videos):
-        user_task.is_completed = True
-        user_task.rating = user_task.task.rating
-        user_task.save()
+    UserVideo.objects.bulk_update(videos, ['watched_seconds', 'is_completed'])
+
+    result = grade('video', {uv.id: uv.is_completed for uv in videos}, {}, user_task.task.rating)
+    if result.outcome == CORRECT:
+        save_grade(user_task, result)
         messages.success(request, 'Видеосабақ аяқталды')
 
 
@@ -83,134 +145,91 @@ def handle_written(request, user_task):
 
 
 # ---------------- text_gap ----------------
+TEXT_GAP_MESSAGES = {
+    CORRECT: (messages.success, 'Барлық жауап дұрыс'),
+    ONE_ERROR: (messages.warning, 'Бір қате бар. Жарты ұпай'),
+    WRONG: (messages.error, 'Қателер көп. Ұпай берілмейді'),
+    PARTIAL: (messages.info, 'Бірнеше қате бар. Жарты ұпай'),
+}
+
+
 def handle_text_gap(request, user_task):
-    total = user_task.user_text_gaps.count()
-    correct = 0
-    for utg in user_task.user_text_gaps.all():
-        user_answer = request.POST.get(f'answer_{utg.id}', '').strip()
-        is_correct = user_answer.lower() == utg.text_gap.correct_answer.strip().lower()
-        utg.answer = user_answer
-        utg.is_correct = is_correct
-        utg.save()
-        if is_correct:
-            correct += 1
-
-    incorrect = total - correct
-    full_rating = user_task.task.rating
-
-    if correct == total:
-        score = full_rating
-        messages.success(request, 'Барлық жауап дұрыс')
-    elif incorrect == 1:
-        score = full_rating / 2 if full_rating > 1 else 0
-        messages.warning(request, 'Бір қате бар. Жарты ұпай')
-    elif incorrect >= total / 2:
-        score = 0
-        messages.error(request, 'Қателер көп. Ұпай берілмейді')
-    else:
-        score = full_rating / 2 if full_rating > 1 else 0
-        messages.info(request, 'Бірнеше қате бар. Жарты ұпай')
-
-    user_task.rating = score
-    user_task.is_completed = True
-    user_task.save()
+    text_gaps = list(user_task.user_text_gaps.all())
+    for utg in text_gaps:
+        utg.answer = request.POST.get(f'answer_{utg.id}', '').strip()
+
+    result = grade(
+        'text_gap', {utg.text_gap_id: utg.answer for utg in text_gaps},
+        get_answer_key(user_task.task), user_task.task.rating,
+    )
+    for utg in text_gaps:
+        utg.is_correct = result.results[utg.text_gap_id]
+    UserTextGap.objects.bulk_update(text_gaps, ['answer', 'is_correct'])
+
+    add_message, message = TEXT_GAP_MESSAGES[result.outcome]
+    add_message(request, message)
+    save_grade(user_task, result)
 
 
 # ---------------- test ----------------
 def handle_test(request, user_task):
-    total = user_task.user_options.count()
-    correct = 0
-    has_incorrect_simple = False
-    multiple_incorrects = 0
-
-    for ua in user_task.user_options.select_related('question'):
-        q = ua.question
-        selected_ids = list(map(int, request.POST.getlist(f'question_{q.id}')))
-        valid_ids = set(q.options.values_list('id', flat=True))
-        selected_ids = [opt_id for opt_id in selected_ids if opt_id in valid_ids]
-        ua.options.set(Option.objects.filter(id__in=selected_ids))
-
-        correct_ids = set(q.options.filter(is_correct=True).values_list('id', flat=True))
-        if q.question_type == 'simple':
-            if set(selected_ids) == correct_ids:
-                correct += 1
-            else:
-                has_incorrect_simple = True
-        elif q.question_type == 'multiple':
-            if set(selected_ids) == correct_ids:
-                correct += 1
-            else:
-                multiple_incorrects += 1
-
-    full_rating = user_task.task.rating
-    if has_incorrect_simple:
-        score = 0
-    elif multiple_incorrects == 1:
-        score = full_rating / 2 if full_rating > 1 else 0
-    elif multiple_incorrects > 1:
-        score = 0
-    elif correct == total:
-        score = full_rating
-    else:
-        score = full_rating / 2 if full_rating > 1 else 0
-
-    user_task.rating = score
-    user_task.is_completed = True
-    user_task.save()
+    answer_key = get_answer_key(user_task.task)
+    answers = list(user_task.user_options.all())
+    selections = {}
+    for ua in answers:
+        _, valid_ids, _ = answer_key.get(ua.question_id, ('simple', frozenset(), frozenset()))
+        selected_ids = set(map(int, request.POST.getlist(f'question_{ua.question_id}')))
+        selections[ua.id] = selected_ids & valid_ids
+
+    # All selections of the submission: one DELETE, one INSERT
+    Through = UserAnswer.options.through
+    Through.objects.filter(useranswer__in=answers).delete()
+    Through.objects.bulk_create([
+        Through(useranswer_id=ua_id, option_id=option_id)
+        for ua_id, option_ids in selections.items()
+        for option_id in option_ids
+    ])
+
+    result = grade(
+        'test', {ua.question_id: selections[ua.id] for ua in answers}, answer_key, user_task.task.rating,
+    )
+    save_grade(user_task, result)
 
 
 # ---------------- matching ----------------
 def handle_matching(request, user_task):
-    for answer in user_task.matching_answers.all():
-        selected_column_id = request.POST.get(f'column_{answer.item.id}')
+    answers = list(user_task.matching_answers.all())
+    for answer in answers:
+        selected_column_id = request.POST.get(f'column_{answer.item_id}')
         if selected_column_id:
             answer.selected_column_id = int(selected_column_id)
-            answer.check_answer()
-
-    total = user_task.matching_answers.count()
-    correct = user_task.matching_answers.filter(is_correct=True).count()
-    wrong = total - correct
-    full_rating = user_task.task.rating
-
-    if wrong == 0:
-        score = full_rating
-    elif wrong == 1:
-        score = full_rating / 2 if full_rating > 1 else 0
-    elif wrong > total / 2:
-        score = 0
-    else:
-        score = full_rating / 2 if full_rating > 1 else 0
-
-    user_task.rating = score
-    user_task.is_completed = True
-    user_task.save()
+
+    # Answers without a new selection keep their previous column
+    result = grade(
+        'matching', {answer.item_id: answer.selected_column_id for answer in answers},
+        get_answer_key(user_task.task), user_task.task.rating,
+    )
+    for answer in answers:
+        answer.is_correct = result.results[answer.item_id]
+    UserMatchingAnswer.objects.bulk_update(answers, ['selected_column', 'is_correct'])
+    save_grade(user_task, result)
 
 
 # ---------------- table ----------------
 def handle_table(request, user_task):
-    correct_map = {
-        (c.row_id, c.column_id): c.correct
-        for c in TableCell.objects.filter(row__task=user_task.task)
-    }
+    answers = list(user_task.user_table_answers.all())
+    for ans in answers:
+        ans.checked = request.POST.get(f'cell_{ans.row_id}_{ans.column_id}') == 'on'
+    UserTableAnswer.objects.bulk_update(answers, ['checked'])
+
+    result = grade(
+        'table', {(ans.row_id, ans.column_id): ans.checked for ans in answers},
+        get_answer_key(user_task.task), user_task.task.rating,
+    )
+    save_grade(user_task, result)
 
-    total, correct = 0, 0
-    for ans in user_task.user_table_answers.all():
-        is_checked = request.POST.get(f'cell_{ans.row_id}_{ans.column_id}') == 'on'
-        ans.checked = is_checked
-        ans.is_submitted = True
-        ans.save()
-        if correct_map.get((ans.row_id, ans.column_id)) == is_checked:
-            correct += 1
-        total += 1
-
-    rating = user_task.task.rating or 1
-    if correct == total:
-        score = rating
-    elif correct >= total / 2:
-        score = rating / 2
-    else:
-        score = 0
-
-    user_task.rating = score
+
+def save_grade(user_task, result):
+    user_task.rating = result.score
     user_task.is_completed = True
-    user_task.save()
\ No newline at end of file
+    user_task.save()
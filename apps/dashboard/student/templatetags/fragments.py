@@ -0,0 +1,42 @@
+from django import template
+from django.core.cache import cache
+from core.utils.fragments import FRAGMENTS, FRAGMENT_TIMEOUT, get_fragment_key, count_fragment
+
+
+register = template.Library()
+
+
+# {% fragment 'name' vary_on... %} ... {% endfragment %}
+# Like {% cache %}, the key is built from the curriculum version and the revisions of the model instances
+# in vary_on (core.utils.fragments). Forms and {% csrf_token %} must stay outside of the fragment.
+class FragmentNode(template.Node):
+    def __init__(self, nodelist, name, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        key = get_fragment_key(self.name, [var.resolve(context) for var in self.vary_on])
+        content = cache.get(key)
+        if content is None:
+            content = self.nodelist.render(context)
+            cache.set(key, content, FRAGMENT_TIMEOUT)
+            count_fragment(self.name, 'misses')
+        else:
+            count_fragment(self.name, 'hits')
+        return content
+
+
+@register.tag
+def fragment(parser, token):
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires at least 1 argument.")
+
+    name = bits[1].strip('\'"')
+    if name not in FRAGMENTS:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag: unknown fragment '{name}'.")
+
+    nodelist = parser.parse(('endfragment', ))
+    parser.delete_first_token()
+    return FragmentNode(nodelist, name, [parser.compile_filter(bit) for bit in bits[2:]])
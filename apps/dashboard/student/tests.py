@@ -0,0 +1,52 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from core.models import User, Subject, Chapter, Lesson
+from core.utils.enrollment import enroll_users
+
+
+# Student dashboard
+# ----------------------------------------------------------------------------------------------------------------------
+# The page must keep a fixed number of queries however many subjects there are
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class StudentDashboardQueryTest(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user('teacher', password='x', user_type='teacher')
+        self.students = [
+            User.objects.create_user(f'student{i}', password='x', user_type='student', user_class='8b')
+            for i in range(4)
+        ]
+        self.client.force_login(self.students[0])
+
+    def create_subject(self, number):
+        subject = Subject.objects.create(name=f'Пән {number}', owner=self.teacher)
+        for chapter_order in range(2):
+            chapter = Chapter.objects.create(subject=subject, name=f'Бөлім {chapter_order}', order=chapter_order)
+            for lesson_order, lesson_type in enumerate(('lesson', 'lesson', 'chapter')):
+                Lesson.objects.create(
+                    subject=subject, chapter=chapter, title=f'Сабақ {lesson_order}', order=lesson_order,
+                    lesson_type=lesson_type, quarter='1',
+                )
+        Lesson.objects.create(subject=subject, chapter=chapter, title='ТЖБ', order=99, lesson_type='quarter', quarter='1')
+        enroll_users(subject, self.students)
+        return subject
+
+    def get_dashboard(self):
+        response = self.client.get(reverse('student'))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_query_count_does_not_depend_on_subject_count(self):
+        self.create_subject(1)
+        with CaptureQueriesContext(connection) as one_subject:
+            self.get_dashboard()
+
+        for number in range(2, 6):
+            self.create_subject(number)
+        with self.assertNumQueries(len(one_subject.captured_queries)):
+            response = self.get_dashboard()
+
+        subject_list = response.context['subject_list']
+        self.assertEqual(len(subject_list), 5)
+        self.assertTrue(all(item['lesson_count'] == 7 and len(item['students']) == 3 for item in subject_list))
@@ -1,10 +1,14 @@
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models.aggregates import Avg
+from django.db.models import Q, F, Window
+from django.db.models.aggregates import Count, Min
+from django.db.models.functions import RowNumber
 from django.shortcuts import render, get_object_or_404, redirect
 from django.utils.translation import gettext_lazy as _
 from core.models import Subject, UserSubject, Lesson, UserChapter, UserLesson
+from core.utils.curriculum import get_curriculum
 from core.utils.decorators import role_required
+from core.utils.enrollment import enroll_user
 
 
 # student dashboard page
@@ -13,55 +17,95 @@ from core.utils.decorators import role_required
 @role_required('student')
 def student_view(request):
     user = request.user
-    subjects = Subject.objects.all()
-    user_subjects_qs = UserSubject.objects.filter(user=user).prefetch_related(
-        'user_chapters__chapter',
-        'user_lessons__lesson__chapter'
+    subjects = Subject.objects.annotate(
+        chapters_count=Count('chapters', distinct=True),
+        lessons_count=Count('lessons', distinct=True),
     )
-    user_subjects = {us.subject_id: us for us in user_subjects_qs}
-    average_percentage = user_subjects_qs.aggregate(avg=Avg('percentage'))['avg'] or 0
-
-    subject_list = []
-    for subject in subjects:
-        user_subject = user_subjects.get(subject.id)
-
-        first_user_chapter = user_subject.user_chapters.first() if user_subject else None
-        first_chapter = first_user_chapter
+    user_subjects = {
+        us.subject_id: us
+        for us in UserSubject.objects.filter(user=user).select_related('subject')
+    }
 
-        first_user_lesson = (
-            user_subject.user_lessons.filter(lesson__chapter=first_chapter.chapter).first()
-            if user_subject and first_chapter else None
+    # ------------------ chapter, lesson counts ------------------
+    chapter_stats = {
+        row['user_subject_id']: row
+        for row in (
+            UserChapter.objects.filter(user_subject__user=user)
+            .values('user_subject_id')
+            .annotate(
+                total=Count('id'),
+                completed=Count('id', filter=Q(is_completed=True)),
+                first_id=Min('id'),
+            )
         )
-        first_lesson = first_user_lesson
+    }
+    lesson_stats = {
+        row['user_subject_id']: row
+        for row in (
+            UserLesson.objects.filter(user_subject__user=user)
+            .values('user_subject_id')
+            .annotate(total=Count('id'), completed=Count('id', filter=Q(is_completed=True)))
+        )
+    }
 
-        completed_chapter_count = 0
-        completed_lesson_count = 0
+    # ------------------ first lesson of the first chapter ------------------
+    first_chapter_ids = [row['first_id'] for row in chapter_stats.values()]
+    first_lesson_ids = dict(
+        UserLesson.objects.filter(
+            user_subject__user=user,
+            lesson__chapter__user_chapters__id__in=first_chapter_ids,
+            lesson__chapter__user_chapters__user_subject=F('user_subject'),
+        )
+        .values('user_subject_id')
+        .annotate(first_id=Min('id'))
+        .values_list('user_subject_id', 'first_id')
+    )
 
-        if user_subject:
-            completed_chapter_count = user_subject.user_chapters.filter(is_completed=True).count()
-            completed_lesson_count = user_subject.user_lessons.filter(is_completed=True).count()
-            quarter_lessons = (
-                user_subject.user_lessons.filter(lesson__lesson_type='quarter').order_by('lesson__quarter'))
-        else:
-            quarter_lessons = []
+    # ------------------ quarter lessons ------------------
+    quarter_lessons = {}
+    for ul in (
+        UserLesson.objects.filter(user_subject__user=user, lesson__lesson_type='quarter')
+        .order_by('lesson__quarter')
+    ):
+        quarter_lessons.setdefault(ul.user_subject_id, []).append(ul)
+
+    # ------------------ first 3 students of every subject ------------------
+    subject_students = {}
+    for us in (
+        UserSubject.objects
+        .annotate(row_number=Window(RowNumber(), partition_by=F('subject_id'), order_by=F('id').asc()))
+        .filter(row_number__lte=3)
+        .select_related('user')
+    ):
+        subject_students.setdefault(us.subject_id, []).append(us)
 
-        subject_students = UserSubject.objects.filter(subject=subject).select_related('user')[:3]
+    subject_list = []
+    for subject in subjects:
+        user_subject = user_subjects.get(subject.id)
+        chapters = chapter_stats.get(user_subject.id, {}) if user_subject else {}
+        lessons = lesson_stats.get(user_subject.id, {}) if user_subject else {}
 
         subject_list.append({
             'subject': subject,
             'user_subject': user_subject,
-            'first_chapter': first_chapter,
-            'first_lesson': first_lesson,
-            'completed_chapter_count': completed_chapter_count,
-            'completed_lesson_count': completed_lesson_count,
-            'quarter_lessons': quarter_lessons,
-            'students': subject_students,
+            'first_chapter_id': chapters.get('first_id'),
+            'first_lesson_id': first_lesson_ids.get(user_subject.id) if user_subject else None,
+            'chapter_count': chapters.get('total', 0),
+            'lesson_count': lessons.get('total', 0),
+            'completed_chapter_count': chapters.get('completed', 0),
+            'completed_lesson_count': lessons.get('completed', 0),
+            'quarter_lessons': quarter_lessons.get(user_subject.id, []) if user_subject else [],
+            'students': subject_students.get(subject.id, []),
         })
 
+    percentages = [us.percentage for us in user_subjects.values()]
+    average_percentage = sum(percentages) / len(percentages) if percentages else 0
+    completed = sum(1 for us in user_subjects.values() if us.is_completed)
+
     context = {
         'statistics': {
-            'in_process': user_subjects_qs.filter(is_completed=False).count(),
-            'completed': user_subjects_qs.filter(is_completed=True).count(),
+            'in_process': len(user_subjects) - completed,
+            'completed': completed,
             'average_percentage': round(average_percentage),
         },
         'subject_list': subject_list,
@@ -76,12 +120,8 @@ def student_view(request):
 def subject_detail_view(request, pk):
     user = request.user
     subject = get_object_or_404(Subject, pk=pk)
-    user_subject = (
-        UserSubject.objects
-        .filter(user=user, subject=subject)
-        .prefetch_related('user_chapters__chapter', 'user_lessons__lesson__chapter')
-        .first()
-    )
+    user_subject = UserSubject.objects.filter(user=user, subject=subject).first()
+    curriculum = get_curriculum(subject.id)
 
     first_chapter_id = None
     first_lesson_id = None
@@ -98,18 +138,10 @@ def subject_detail_view(request, pk):
                 first_lesson_id = first_user_lesson.id
 
     chapters = []
-    for chapter in subject.chapters.all():
-        lessons = []
-        for lesson in chapter.lessons.all():
-            lesson_duration = sum(task.duration for task in lesson.tasks.all())
-            lessons.append({
-                'lesson': lesson,
-                'duration': lesson_duration,
-            })
-
+    for chapter in curriculum.chapters:
         chapters.append({
             'chapter': chapter,
-            'lessons': lessons,
+            'lessons': [{'lesson': lesson, 'duration': lesson.duration} for lesson in chapter.lessons],
         })
 
     context = {
@@ -118,6 +150,8 @@ def subject_detail_view(request, pk):
         'first_chapter_id': first_chapter_id,
         'first_lesson_id': first_lesson_id,
         'chapters': chapters,
+        'chapters_count': len(curriculum.chapters),
+        'lessons_count': len(curriculum.lessons),
     }
     return render(request, 'app/dashboard/student/subject/page.html', context)
 
@@ -134,13 +168,7 @@ def enroll_user_to_subject(request, subject_id):
         messages.warning(request, _('Бұл пәнде бөлімдер мен сабақтар әлі қосылмаған'))
         return redirect('student')
 
-    user_subject, __ = UserSubject.objects.get_or_create(user=user, subject=subject)
-
-    for chapter in subject.chapters.all():
-        UserChapter.objects.get_or_create(user_subject=user_subject, user=user, chapter=chapter)
-
-        for lesson in chapter.lessons.all():
-            UserLesson.objects.get_or_create(user_subject=user_subject, user=user, lesson=lesson)
+    enroll_user(subject, user)
 
     messages.success(request, _('Пән қосылды!'))
     return redirect('student')
@@ -5,4 +5,5 @@ from . import views
 urlpatterns = [
     path('', views.teacher_view, name='teacher'),
     path('subject/<subject_id>/', views.subject_manage_view, name='subject_manage'),
+    path('subject/<subject_id>/enroll/', views.enroll_class_handler, name='enroll_class'),
 ]
\ No newline at end of file
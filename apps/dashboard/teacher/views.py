@@ -1,10 +1,38 @@
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
-from django.db.models.aggregates import Avg, Sum, Count
-from django.shortcuts import render, get_object_or_404
+from django.db.models import Q, F, Window
+from django.db.models.aggregates import Avg, Count
+from django.db.models.functions import RowNumber
+from django.shortcuts import render, get_object_or_404, redirect
+from django.views.decorators.http import require_POST
 
-from core.models import Subject, UserSubject, UserChapter, UserLesson, User, Lesson, Chapter
+from core.models import Subject, UserSubject, UserChapter, UserLesson, UserQuarterGrade, User, Lesson, Chapter
 from core.utils.decorators import role_required
+from core.utils.jobs import enqueue
+from core.utils.progress import set_quarter_percentages
+
+
+# БЖБ/ТЖБ есеп кестесінің деңгейлері: lesson_type -> (өріс, шекаралар)
+REPORT_BAND_NAMES = ('low', 'mid', 'mid2', 'high')
+REPORT_BANDS = {
+    'quarter': ('rating', (12, 20, 26)),
+    'chapter': ('percentage', (40, 65, 85)),
+}
+
+
+# {'<lesson_type>_<band>': Count(filter=Q(...))} for every band of every lesson type
+def get_report_band_counts():
+    counts = {}
+    for lesson_type, (field, thresholds) in REPORT_BANDS.items():
+        bounds = (None, *thresholds, None)
+        for band, low, high in zip(REPORT_BAND_NAMES, bounds, bounds[1:]):
+            condition = Q(lesson__lesson_type=lesson_type)
+            if low is not None:
+                condition &= Q(**{f'{field}__gte': low})
+            if high is not None:
+                condition &= Q(**{f'{field}__lt': high})
+            counts[f'{lesson_type}_{band}'] = Count('id', filter=condition)
+    return counts
 
 
 # Teacher dashboard page
@@ -12,45 +40,67 @@ from core.utils.decorators import role_required
 @login_required
 @role_required('teacher')
 def teacher_view(request):
-    subjects_data = []
-
-    for subject in Subject.objects.all():
-        user_subjects = UserSubject.objects.filter(subject=subject)
-        subject_avg = user_subjects.aggregate(
-            avg_rating=Avg('rating'),
-            avg_percentage=Avg('percentage')
+    def safe_round(value):
+        return round(value) if value is not None else 0
+
+    subject_stats = {
+        row['subject_id']: row
+        for row in (
+            UserSubject.objects.values('subject_id')
+            .annotate(count=Count('id'), avg_rating=Avg('rating'), avg_percentage=Avg('percentage'))
         )
-        chapter_stats = UserChapter.objects.filter(user_subject__subject=subject).aggregate(
-            avg_rating=Avg('rating'),
-            avg_percentage=Avg('percentage')
+    }
+    chapter_stats = {
+        row['user_subject__subject_id']: row
+        for row in (
+            UserChapter.objects.values('user_subject__subject_id')
+            .annotate(avg_rating=Avg('rating'), avg_percentage=Avg('percentage'))
         )
-        lesson_stats = UserLesson.objects.filter(user_subject__subject=subject).aggregate(
-            avg_rating=Avg('rating'),
-            avg_percentage=Avg('percentage')
+    }
+    lesson_stats = {
+        row['user_subject__subject_id']: row
+        for row in (
+            UserLesson.objects.values('user_subject__subject_id')
+            .annotate(avg_rating=Avg('rating'), avg_percentage=Avg('percentage'))
         )
+    }
 
-        def safe_round(value):
-            return round(value) if value is not None else 0
+    # Әр пәннің алғашқы 3 оқушысы
+    subject_students = {}
+    for us in (
+        UserSubject.objects
+        .annotate(row_number=Window(RowNumber(), partition_by=F('subject_id'), order_by=F('id').asc()))
+        .filter(row_number__lte=3)
+        .select_related('user')
+    ):
+        subject_students.setdefault(us.subject_id, []).append(us)
+
+    subjects = list(Subject.objects.all())
+    subjects_data = []
+    for subject in subjects:
+        subject_avg = subject_stats.get(subject.id, {})
+        chapter_avg = chapter_stats.get(subject.id, {})
+        lesson_avg = lesson_stats.get(subject.id, {})
 
         subjects_data.append({
             'subject': subject,
-            'students': user_subjects[:3],
+            'students': subject_students.get(subject.id, []),
             # user_subjects avg
-            'subject_avg_rating': safe_round(subject_avg['avg_rating']),
-            'subject_avg_percentage': safe_round(subject_avg['avg_percentage']),
+            'subject_avg_rating': safe_round(subject_avg.get('avg_rating')),
+            'subject_avg_percentage': safe_round(subject_avg.get('avg_percentage')),
             # user_chapters avg
-            'chapter_avg_rating': safe_round(chapter_stats['avg_rating']),
-            'chapter_avg_percentage': safe_round(chapter_stats['avg_percentage']),
+            'chapter_avg_rating': safe_round(chapter_avg.get('avg_rating')),
+            'chapter_avg_percentage': safe_round(chapter_avg.get('avg_percentage')),
             # user_lessons avg
-            'lesson_avg_rating': safe_round(lesson_stats['avg_rating']),
-            'lesson_avg_percentage': safe_round(lesson_stats['avg_percentage']),
+            'lesson_avg_rating': safe_round(lesson_avg.get('avg_rating')),
+            'lesson_avg_percentage': safe_round(lesson_avg.get('avg_percentage')),
         })
 
     context = {
         'generics': {
             'classes_count': 2,
-            'subjects_count': Subject.objects.all().count(),
-            'students_count': UserSubject.objects.all().count()
+            'subjects_count': len(subjects),
+            'students_count': sum(row['count'] for row in subject_stats.values())
         },
         'subjects_data': subjects_data,
     }
@@ -131,111 +181,76 @@ def subject_manage_view(request, subject_id):
         quarter=selected_quarter
     ).order_by('lesson_type', 'order')
 
+    # Сынып фильтрі UserLesson арқылы да қолданылады
+    histogram = {
+        row['lesson_id']: row
+        for row in (
+            UserLesson.objects.filter(user_subject__in=user_subjects, lesson__in=lessons)
+            .values('lesson_id')
+            .annotate(students_count=Count('user_subject_id', distinct=True), **get_report_band_counts())
+        )
+    }
+
     report_data = []
     for lesson in lessons:
-        # Сынып фильтрі UserLesson арқылы да қолданылады
-        ul_qs = UserLesson.objects.filter(user_subject__in=user_subjects, lesson=lesson)
-
-        students_count = ul_qs.values('user_subject_id').distinct().count()
-        max_score = getattr(lesson, 'max_rating', None)
-        if max_score is None:
-            max_score = lesson.tasks.aggregate(total=Sum('rating'))['total'] or 0
-
-        if lesson.lesson_type == 'quarter':
-            low = ul_qs.filter(rating__lt=12).count()
-            mid = ul_qs.filter(rating__gte=12, rating__lt=20).count()
-            mid2 = ul_qs.filter(rating__gte=20, rating__lt=26).count()
-            high = ul_qs.filter(rating__gte=26).count()
-        else:
-            low = ul_qs.filter(percentage__lt=40).count()
-            mid = ul_qs.filter(percentage__gte=40, percentage__lt=65).count()
-            mid2 = ul_qs.filter(percentage__gte=65, percentage__lt=85).count()
-            high = ul_qs.filter(percentage__gte=85).count()
-
+        row = histogram.get(lesson.id, {})
         report_data.append({
             'lesson': lesson,
             'lesson_type': lesson.get_lesson_type_display(),
-            'students_count': students_count,
-            'max_score': max_score,
-            'low': low,
-            'mid': mid,
-            'mid2': mid2,
-            'high': high,
+            'students_count': row.get('students_count', 0),
+            'max_score': lesson.max_rating,
+            **{band: row.get(f'{lesson.lesson_type}_{band}', 0) for band in REPORT_BAND_NAMES},
         })
 
     # -------------------- Оқушылардың тоқсандық бағалар кестесі --------------------
-    chapter_lessons = (
+    chapter_lessons = list(
         Lesson.objects.filter(subject=subject, lesson_type='chapter', quarter=selected_quarter).order_by('order')
     )
     quarter_lesson = Lesson.objects.filter(subject=subject, lesson_type='quarter', quarter=selected_quarter).first()
 
+    # Барлық оқушылардың тоқсандағы бағалары бір сұраныспен
+    lesson_grades_map = {}
+    lesson_ratings_map = {}
+    for user_subject_id, lesson_id, lesson_type, rating in (
+        UserLesson.objects.filter(user_subject__in=user_subjects, lesson__quarter=selected_quarter)
+        .order_by('lesson__order', 'id')
+        .values_list('user_subject_id', 'lesson_id', 'lesson__lesson_type', 'rating')
+    ):
+        if lesson_type == 'lesson':
+            lesson_grades_map.setdefault(user_subject_id, []).append(rating)
+        lesson_ratings_map.setdefault(user_subject_id, {}).setdefault(lesson_id, rating)
+
+    # Тоқсандық бағалар сабақ аяқталған сайын UserQuarterGrade-те жаңартылады
+    quarter_grades = {
+        grade.user_subject_id: grade
+        for grade in UserQuarterGrade.objects.filter(user_subject__in=user_subjects, quarter=selected_quarter)
+    }
+
     # Оқушылар
     students_data = []
     for us in user_subjects:
-        lessons_qs = UserLesson.objects.filter(
-            user_subject=us,
-            lesson__quarter=selected_quarter
-        ).select_related('lesson')
-
-        # Формативті (lesson типі)
-        lesson_grades = list(lessons_qs.filter(lesson__lesson_type='lesson').values_list('rating', flat=True))
-        lesson_score_sum = sum([g for g in lesson_grades if g is not None])
-        lesson_count = len(lesson_grades)
+        ratings = lesson_ratings_map.get(us.id, {})
+        grade = quarter_grades.get(us.id) or set_quarter_percentages(UserQuarterGrade(), {})
 
         # БЖБ (chapter типі)
         chapter_grades = []
-        chapter_score_sum = 0
         for ch in chapter_lessons:
-            grade = lessons_qs.filter(lesson=ch).values_list('rating', flat=True).first()
-            grade_val = grade if grade is not None else 0
-            chapter_grades.append(grade if grade is not None else '-')
-            chapter_score_sum += grade_val
+            chapter_grade = ratings.get(ch.id)
+            chapter_grades.append(chapter_grade if chapter_grade is not None else '-')
 
         # ТЖБ (quarter типі)
-        quarter_grade = None
-        if quarter_lesson:
-            quarter_grade = lessons_qs.filter(lesson=quarter_lesson).values_list('rating', flat=True).first()
-            quarter_max = getattr(quarter_lesson, 'max_rating', 0) or 0
-        else:
-            quarter_max = 0
-
-        # Макс. мәндер
-        chapter_max_sum = sum([getattr(ch, 'max_rating', 0) or 0 for ch in chapter_lessons])
-        lesson_max_sum = lesson_count * 10  # әр lesson 10 баллдық деп алынады
-
-        # Есептеу формулалары
-        fb_bjb_percent = 0
-        if (chapter_max_sum + lesson_max_sum) > 0:
-            fb_bjb_percent = ((chapter_score_sum + lesson_score_sum) / (chapter_max_sum + lesson_max_sum)) * 50
-
-        tjb_percent = 0
-        if quarter_grade and quarter_max:
-            tjb_percent = (quarter_grade / quarter_max) * 50
-
-        total_percent = fb_bjb_percent + tjb_percent
-        if total_percent > 100:
-            total_percent = 100
-
-        # Тоқсандық баға (5 балдық шкала)
-        if total_percent <= 40:
-            quarter_mark = 2
-        elif total_percent <= 65:
-            quarter_mark = 3
-        elif total_percent <= 85:
-            quarter_mark = 4
-        else:
-            quarter_mark = 5
+        quarter_grade = ratings.get(quarter_lesson.id) if quarter_lesson else None
 
         # Қорытынды
         students_data.append({
             'student': us.user,
-            'lesson_grades': lesson_grades,
+            'lesson_grades': lesson_grades_map.get(us.id, []),
             'chapter_grades': chapter_grades,
             'quarter_grade': quarter_grade or '-',
-            'fb_bjb_percent': round(fb_bjb_percent, 2),
-            'tjb_percent': round(tjb_percent, 2),
-            'total_percent': round(total_percent, 2),
-            'quarter_mark': quarter_mark,
+            'fb_bjb_percent': grade.fb_bjb_percent,
+            'tjb_percent': grade.tjb_percent,
+            'total_percent': grade.total_percent,
+            'quarter_mark': grade.mark,
         })
 
     # -------------------- Орташа мәндер (фильтрге сәйкес) --------------------
@@ -258,6 +273,7 @@ def subject_manage_view(request, subject_id):
         'selected_class': selected_class,
         'selected_quarter': selected_quarter,
         'quarters': ['1', '2', '3', '4'],
+        'user_classes': [c for c in User.USER_CLASS if c[0] != 'none'],
         'generics': {
             'total_chapters': total_chapters,
             'completed_chapters': completed_chapters,
@@ -282,4 +298,28 @@ def subject_manage_view(request, subject_id):
         }
     }
 
-    return render(request, 'app/dashboard/teacher/subject/page.html', context)
\ No newline at end of file
+    return render(request, 'app/dashboard/teacher/subject/page.html', context)
+
+
+# Enroll class handler
+# ----------------------------------------------------------------------------------------------------------------------
+@login_required
+@role_required('teacher')
+@require_POST
+def enroll_class_handler(request, subject_id):
+    subject = get_object_or_404(Subject, pk=subject_id)
+    user_class = request.POST.get('class') or ''
+
+    if user_class not in dict(User.USER_CLASS) or user_class == 'none':
+        messages.warning(request, 'Сынып таңдалмаған')
+        return redirect('subject_manage', subject_id=subject_id)
+
+    if not subject.chapters.exists() or not Lesson.objects.filter(chapter__subject=subject).exists():
+        messages.warning(request, 'Бұл пәнде бөлімдер мен сабақтар әлі қосылмаған')
+        return redirect('subject_manage', subject_id=subject_id)
+
+    # Large classes are enrolled by the worker (core.jobs), not in the request
+    enqueue('enroll_class', subject_id=subject.id, user_class=user_class)
+
+    messages.success(request, 'Сыныпты пәнге қосу кезекке қойылды, оқушылар бірнеше минутта қосылады')
+    return redirect('subject_manage', subject_id=subject_id)
@@ -125,6 +125,19 @@ STATICFILES_DIRS = [
 ]
 
 
+# Cache
+# ----------------------------------------------------------------------------------------------------------------------
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('CACHE_LOCATION', default=str(BASE_DIR / 'cache')),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
+
+
 # Templates settings
 # ----------------------------------------------------------------------------------------------------------------------
 TAILWIND_APP_NAME = 'ui'
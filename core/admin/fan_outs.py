@@ -0,0 +1,23 @@
+from django.contrib import admin, messages
+from core.models import FanOut
+from core.utils.fan_out import start_fan_out
+
+
+# FanOut admin
+# ----------------------------------------------------------------------------------------------------------------------
+@admin.register(FanOut)
+class FanOutAdmin(admin.ModelAdmin):
+    list_display = ('lesson', 'task', 'status', 'processed', 'total', 'created_at', 'updated_at', )
+    list_filter = ('status', )
+    readonly_fields = ('lesson', 'task', 'status', 'total', 'processed', 'cursor', 'error', 'created_at', 'updated_at', )
+    actions = ('retry', )
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Қате аяқталған таратуларды қайта іске қосу')
+    def retry(self, request, queryset):
+        failed = list(queryset.filter(status='failed'))
+        for fan_out in failed:
+            start_fan_out(fan_out)
+        self.message_user(request, f'Қайта іске қосылған таратулар: {len(failed)}', messages.SUCCESS)
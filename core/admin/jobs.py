@@ -0,0 +1,27 @@
+from django.contrib import admin, messages
+from django.utils import timezone
+from core.models import Job
+
+
+# Job admin
+# ----------------------------------------------------------------------------------------------------------------------
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_by', 'created_at', 'finished_at', )
+    list_filter = ('status', 'name', )
+    search_fields = ('name', 'locked_by', )
+    readonly_fields = (
+        'name', 'payload', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_by', 'locked_at', 'unique_key',
+        'last_error', 'created_at', 'finished_at',
+    )
+    actions = ('retry', )
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Қате аяқталған тапсырмаларды қайта кезекке қою')
+    def retry(self, request, queryset):
+        retried = queryset.filter(status='failed').update(
+            status='queued', attempts=0, run_at=timezone.now(), finished_at=None, last_error=''
+        )
+        self.message_user(request, f'Қайта кезекке қойылған тапсырмалар: {retried}', messages.SUCCESS)
@@ -1,10 +1,11 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.urls import reverse
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 from core.models import Subject, Chapter, Lesson, LessonDocs
 from django_summernote.admin import SummernoteModelAdmin, SummernoteModelAdminMixin
 from core.models.tasks import Task
+from core.utils.jobs import enqueue
 
 
 # Subject admin
@@ -49,6 +50,13 @@ class SubjectAdmin(SummernoteModelAdmin):
     search_fields = ('name', 'description', )
     list_filter = ('owner', )
     inlines = (ChapterTab, LessonTab, )
+    actions = ('regrade', )
+
+    @admin.action(description='Пән тапсырмаларын қайта бағалау')
+    def regrade(self, request, queryset):
+        task_ids = Task.objects.filter(lesson__chapter__subject__in=queryset).values_list('id', flat=True)
+        enqueue('regrade', task_ids=list(task_ids))
+        self.message_user(request, 'Қайта бағалау кезекке қойылды', messages.SUCCESS)
 
 
 # Chapter admin
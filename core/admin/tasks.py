@@ -1,9 +1,10 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.urls import reverse
 from django.utils.html import format_html
 from django_summernote.admin import SummernoteModelAdmin, SummernoteModelAdminMixin
 from core.models import Task, Question, Option, Written, TextGap, Video, MatchingColumn, MatchingItem, TableColumn, \
     TableRow, TableCell
+from core.utils.jobs import enqueue
 
 
 # Task admin
@@ -92,6 +93,12 @@ class TableRowTab(SummernoteModelAdminMixin, admin.TabularInline):
 class TaskAdmin(SummernoteModelAdmin):
     list_display = ('lesson', 'rating', 'duration', 'order', )
     readonly_fields = ('lesson_link', )
+    actions = ('regrade', )
+
+    @admin.action(description='Таңдалған тапсырмаларды қайта бағалау')
+    def regrade(self, request, queryset):
+        enqueue('regrade', task_ids=list(queryset.values_list('id', flat=True)))
+        self.message_user(request, 'Қайта бағалау кезекке қойылды', messages.SUCCESS)
 
     def lesson_link(self, obj):
         if obj.lesson:
@@ -4,7 +4,7 @@ from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 from django_summernote.admin import SummernoteModelAdminMixin
 
-from core.models import UserSubject, UserLesson, UserChapter, UserTask, Feedback
+from core.models import UserSubject, UserLesson, UserChapter, UserQuarterGrade, UserTask, Feedback
 
 
 # UserSubject admin
@@ -15,6 +15,20 @@ class UserChapterTab(admin.TabularInline):
     extra = 0
 
 
+# UserQuarterGrade Tab
+class UserQuarterGradeTab(admin.TabularInline):
+    model = UserQuarterGrade
+    extra = 0
+    readonly_fields = (
+        'quarter', 'lesson_sum', 'chapter_sum', 'quarter_rating', 'fb_bjb_percent', 'tjb_percent', 'total_percent',
+        'mark', 'updated_at',
+    )
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 # UserLesson Tab
 class UserLessonTab(admin.StackedInline):
     model = UserLesson
@@ -36,7 +50,7 @@ class UserSubjectAdmin(admin.ModelAdmin):
     list_display = ('user', 'subject', 'rating', 'percentage', 'created_at', 'is_completed', )
     list_filter = ('user', 'subject', 'is_completed', )
     search_fields = ('user__first_name', 'user__last_name', 'subject__name')
-    inlines = (UserChapterTab, UserLessonTab, )
+    inlines = (UserChapterTab, UserQuarterGradeTab, UserLessonTab, )
 
 
 # UserLesson admin
@@ -10,3 +10,6 @@ class CoreConfig(AppConfig):
 
     def ready(self):
         import core.signals.subjects
+        import core.signals.tasks
+        import core.signals.curriculum
+        import core.signals.answer_keys
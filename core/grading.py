@@ -0,0 +1,139 @@
+from typing import NamedTuple
+
+
+# Grading engine
+# ----------------------------------------------------------------------------------------------------------------------
+# Pure scoring rules, no ORM / request / messages. Every grader takes the answers of one UserTask,
+# the task answer key (core.utils.answer_keys) and the full rating of the task:
+#   video:    {video_id: is_completed}
+#   text_gap: {text_gap_id: answer}
+#   test:     {question_id: {selected_option_ids}}
+#   matching: {item_id: selected_column_id or None}
+#   table:    {(row_id, column_id): checked}
+CORRECT = 'correct'
+ONE_ERROR = 'one_error'
+PARTIAL = 'partial'
+WRONG = 'wrong'
+
+
+class Grade(NamedTuple):
+    score: float
+    correct: int
+    total: int
+    outcome: str
+    results: dict   # {answer item: is_correct}
+
+
+def half_rating(full_rating):
+    return full_rating / 2 if full_rating > 1 else 0
+
+
+def _grade(results, score, outcome):
+    return Grade(score, sum(results.values()), len(results), outcome, results)
+
+
+# ---------------- video ----------------
+def grade_video(answers, answer_key, full_rating):
+    results = {video_id: bool(is_completed) for video_id, is_completed in answers.items()}
+    if all(results.values()):
+        return _grade(results, full_rating, CORRECT)
+    return _grade(results, 0, PARTIAL)
+
+
+# ---------------- text_gap ----------------
+def grade_text_gap(answers, answer_key, full_rating):
+    results = {
+        text_gap_id: (answer or '').strip().lower() == answer_key.get(text_gap_id)
+        for text_gap_id, answer in answers.items()
+    }
+    total = len(results)
+    incorrect = total - sum(results.values())
+
+    if incorrect == 0:
+        return _grade(results, full_rating, CORRECT)
+    if incorrect == 1:
+        return _grade(results, half_rating(full_rating), ONE_ERROR)
+    if incorrect >= total / 2:
+        return _grade(results, 0, WRONG)
+    return _grade(results, half_rating(full_rating), PARTIAL)
+
+
+# ---------------- test ----------------
+def grade_test(answers, answer_key, full_rating):
+    results = {}
+    has_incorrect_simple = False
+    multiple_incorrects = 0
+    for question_id, selected_ids in answers.items():
+        question_type, _, correct_ids = answer_key.get(question_id, ('simple', frozenset(), frozenset()))
+        results[question_id] = is_correct = set(selected_ids) == correct_ids
+        if is_correct:
+            continue
+        if question_type == 'simple':
+            has_incorrect_simple = True
+        elif question_type == 'multiple':
+            multiple_incorrects += 1
+
+    if has_incorrect_simple or multiple_incorrects > 1:
+        return _grade(results, 0, WRONG)
+    if multiple_incorrects == 1:
+        return _grade(results, half_rating(full_rating), ONE_ERROR)
+    if all(results.values()):
+        return _grade(results, full_rating, CORRECT)
+    # Questions of an unknown type are neither correct nor counted as errors
+    return _grade(results, half_rating(full_rating), PARTIAL)
+
+
+# ---------------- matching ----------------
+def grade_matching(answers, answer_key, full_rating):
+    results = {
+        item_id: column_id is not None and answer_key.get(item_id) == column_id
+        for item_id, column_id in answers.items()
+    }
+    total = len(results)
+    wrong = total - sum(results.values())
+
+    if wrong == 0:
+        return _grade(results, full_rating, CORRECT)
+    if wrong == 1:
+        return _grade(results, half_rating(full_rating), ONE_ERROR)
+    if wrong > total / 2:
+        return _grade(results, 0, WRONG)
+    return _grade(results, half_rating(full_rating), PARTIAL)
+
+
+# ---------------- table ----------------
+def grade_table(answers, answer_key, full_rating):
+    results = {cell: answer_key.get(cell) == checked for cell, checked in answers.items()}
+    rating = full_rating or 1
+    correct = sum(results.values())
+
+    if correct == len(results):
+        return _grade(results, rating, CORRECT)
+    if correct >= len(results) / 2:
+        return _grade(results, rating / 2, PARTIAL)
+    return _grade(results, 0, WRONG)
+
+
+GRADERS = {
+    'video': grade_video,
+    'text_gap': grade_text_gap,
+    'test': grade_test,
+    'matching': grade_matching,
+    'table': grade_table,
+}
+
+
+def grade(task_type, answers, answer_key, full_rating):
+    return GRADERS[task_type](answers, answer_key, full_rating)
+
+
+# Batch API
+# ----------------------------------------------------------------------------------------------------------------------
+# Scores many submissions of one task with a single answer key.
+# submissions: {user_task_id: answers}, returns {user_task_id: Grade}
+def grade_batch(task_type, answer_key, full_rating, submissions):
+    grader = GRADERS[task_type]
+    return {
+        user_task_id: grader(answers, answer_key, full_rating)
+        for user_task_id, answers in submissions.items()
+    }
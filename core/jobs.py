@@ -0,0 +1,51 @@
+from core.models import FanOut, Subject, Task, UserSubject
+from core.utils.enrollment import enroll_class
+from core.utils.fan_out import run_fan_out
+from core.utils.progress import rebuild_progress_counters, rebuild_quarter_grades
+from core.utils.regrade import regrade_tasks
+
+
+# Background jobs
+# ----------------------------------------------------------------------------------------------------------------------
+# Run by `manage.py run_worker`, enqueued with core.utils.jobs.enqueue(name, **payload).
+# Every job gets the payload as keyword arguments and must be safe to run again after a failure.
+
+# ---------------- new lesson / task: per-student rows (core.utils.fan_out) ----------------
+def fan_out_job(fan_out_id):
+    fan_out = FanOut.objects.filter(pk=fan_out_id).first()
+    if fan_out:
+        # The job is claimed by one worker only, a fan-out left running by a killed worker is continued
+        run_fan_out(fan_out, ('pending', 'failed', 'running'))
+
+
+# ---------------- teacher: enroll a whole class to the subject ----------------
+def enroll_class_job(subject_id, user_class):
+    enroll_class(Subject.objects.get(pk=subject_id), user_class)
+
+
+# ---------------- admin: regrade the stored answers of the tasks ----------------
+def regrade_job(task_ids):
+    regrade_tasks(Task.objects.filter(id__in=task_ids))
+
+
+# ---------------- progress counters and quarter grades ----------------
+def rebuild_progress_job(subject_id=None):
+    user_subjects = UserSubject.objects.all()
+    if subject_id:
+        user_subjects = user_subjects.filter(subject_id=subject_id)
+    rebuild_progress_counters(user_subjects)
+    rebuild_quarter_grades(user_subjects)
+
+
+# ---------------- quarter grades after a task rating / lesson change ----------------
+def rebuild_quarter_grades_job(subject_id):
+    rebuild_quarter_grades(UserSubject.objects.filter(subject_id=subject_id))
+
+
+JOBS = {
+    'fan_out': fan_out_job,
+    'enroll_class': enroll_class_job,
+    'regrade': regrade_job,
+    'rebuild_progress': rebuild_progress_job,
+    'rebuild_quarter_grades': rebuild_quarter_grades_job,
+}
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from core.utils.fragments import get_fragment_stats, reset_fragment_stats
+
+
+class Command(BaseCommand):
+    help = 'Шаблон фрагменттері кэшінің hit/miss санауыштарын көрсетеді'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Көрсеткеннен кейін санауыштарды нөлдеу')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"Фрагмент":<20} {"hits":>10} {"misses":>10} {"hit %":>8}')
+        for name, (hits, misses) in get_fragment_stats().items():
+            total = hits + misses
+            ratio = f'{hits * 100 / total:.1f}' if total else '-'
+            self.stdout.write(f'{name:<20} {hits:>10} {misses:>10} {ratio:>8}')
+
+        if options['reset']:
+            reset_fragment_stats()
+            self.stdout.write(self.style.SUCCESS('Санауыштар нөлденді'))
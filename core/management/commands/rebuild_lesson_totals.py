@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from core.models import Lesson
+from core.utils.curriculum import bump_curriculum_version
+from core.utils.lessons import refresh_lesson_totals
+
+
+class Command(BaseCommand):
+    help = 'Lesson.max_rating және Lesson.total_duration мәндерін тапсырмалардан қайта есептейді'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subject', type=int, help='Тек осы пәннің (Subject id) сабақтары')
+
+    def handle(self, *args, **options):
+        lessons = Lesson.objects.all()
+        if options['subject']:
+            lessons = lessons.filter(chapter__subject_id=options['subject'])
+
+        updated = refresh_lesson_totals(lessons)
+        bump_curriculum_version()
+        self.stdout.write(self.style.SUCCESS(f'Сабақтар жаңартылды: {updated}'))
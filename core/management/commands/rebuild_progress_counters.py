@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from core.models import UserSubject
+from core.utils.progress import rebuild_progress_counters, rebuild_quarter_grades
+
+
+class Command(BaseCommand):
+    help = 'UserChapter/UserSubject сабақ санауыштарын және тоқсандық бағаларды UserLesson жазбаларынан қайта есептейді'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subject', type=int, help='Тек осы пәннің (Subject id) жазбалары')
+
+    def handle(self, *args, **options):
+        user_subjects = UserSubject.objects.all()
+        if options['subject']:
+            user_subjects = user_subjects.filter(subject_id=options['subject'])
+
+        updated = rebuild_progress_counters(user_subjects)
+        self.stdout.write(self.style.SUCCESS(f'Санауыштар жаңартылды: {updated} жазба'))
+
+        grades = rebuild_quarter_grades(user_subjects)
+        self.stdout.write(self.style.SUCCESS(f'Тоқсандық бағалар жаңартылды: {len(grades)} жазба'))
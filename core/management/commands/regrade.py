@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Task
+from core.utils.regrade import regrade_tasks
+
+
+class Command(BaseCommand):
+    help = 'Орындалған тапсырмаларды ағымдағы дұрыс жауаптар мен ұпайлар бойынша қайта бағалайды'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subject', type=int, help='Осы пәннің (Subject id) барлық тапсырмалары')
+        parser.add_argument('--lesson', type=int, help='Осы сабақтың (Lesson id) тапсырмалары')
+        parser.add_argument('--task', type=int, nargs='+', help='Тапсырмалар (Task id)')
+
+    def handle(self, *args, **options):
+        tasks = Task.objects.all()
+        if options['subject']:
+            tasks = tasks.filter(lesson__chapter__subject_id=options['subject'])
+        if options['lesson']:
+            tasks = tasks.filter(lesson_id=options['lesson'])
+        if options['task']:
+            tasks = tasks.filter(id__in=options['task'])
+        if not tasks.exists():
+            raise CommandError('Тапсырмалар табылмады')
+
+        regraded = regrade_tasks(tasks)
+        self.stdout.write(self.style.SUCCESS(f'Қайта бағаланған тапсырмалар: {regraded}'))
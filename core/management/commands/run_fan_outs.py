@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from core.models import FanOut
+from core.utils.fan_out import run_fan_out
+
+
+class Command(BaseCommand):
+    help = 'Аяқталмаған (күтуде немесе қате) оқушыларға таратуларды жалғастырады'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stuck', action='store_true',
+            help='Орындалуда күйінде қалып қойғандарын да (мысалы, сервер қайта іске қосылғанда) жалғастыру'
+        )
+
+    def handle(self, *args, **options):
+        statuses = ('pending', 'failed', 'running') if options['stuck'] else ('pending', 'failed')
+        for fan_out in FanOut.objects.filter(status__in=statuses).order_by('id'):
+            try:
+                if run_fan_out(fan_out, statuses):
+                    self.stdout.write(self.style.SUCCESS(f'{fan_out}: аяқталды'))
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'{fan_out}: {e}'))
@@ -0,0 +1,98 @@
+import os
+import signal
+import socket
+import threading
+import time
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections, connection
+from core.jobs import JOBS
+from core.utils.jobs import claim_jobs, requeue_stale_jobs, run_job, STALE_TIMEOUT
+
+
+SWEEP_INTERVAL = 60     # seconds between the stale job sweeps of the main thread
+
+
+class Command(BaseCommand):
+    help = 'Дерекқордағы фондық тапсырмаларды (Job) орындайды'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=1, help='Қатар жұмыс істейтін ағындар саны')
+        parser.add_argument('--interval', type=float, default=5, help='Кезек бос болғанда тексеру аралығы (секунд)')
+        parser.add_argument(
+            '--stale-timeout', type=int, default=STALE_TIMEOUT,
+            help='Осыдан (секунд) ұзақ орындалуда қалған тапсырмалар қайта кезекке қойылады '
+                 '(әрекеттері біткендері қате болып белгіленеді)'
+        )
+        parser.add_argument('--once', action='store_true', help='Кезектегі тапсырмаларды орындап, шығу')
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        # SIGTERM (deploy / restart): the running jobs are finished, no new jobs are claimed
+        previous_handler = signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        threads = [
+            threading.Thread(target=self.work, args=(f'{worker}:{i}', options, stop), daemon=True)
+            for i in range(max(options['threads'], 1))
+        ]
+        # Stale jobs are swept on a timer by the main thread, also while the queue is busy
+        self.sweep(options)
+        swept_at = time.monotonic()
+
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f'Worker {worker}: {len(threads)} ағын')
+
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=1)
+                if time.monotonic() - swept_at >= SWEEP_INTERVAL:
+                    self.sweep(options)
+                    swept_at = time.monotonic()
+        except KeyboardInterrupt:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        finally:
+            signal.signal(signal.SIGTERM, previous_handler)
+            connection.close()
+
+    def sweep(self, options):
+        try:
+            close_old_connections()
+            requeued, failed = requeue_stale_jobs(options['stale_timeout'])
+        except DatabaseError as e:
+            self.stdout.write(self.style.ERROR(f'Stale sweep: {e}'))
+            connection.close()
+            return
+        if requeued or failed:
+            self.stdout.write(f'Қалып қойған тапсырмалар: {requeued} қайта кезекте, {failed} қате')
+
+    def work(self, worker, options, stop):
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                try:
+                    jobs = claim_jobs(worker)
+                except DatabaseError as e:
+                    # e.g. the database restarting, the thread keeps polling (--once: stops)
+                    self.stdout.write(self.style.ERROR(f'{worker}: {e}'))
+                    connection.close()
+                    if options['once']:
+                        break
+                    stop.wait(options['interval'])
+                    continue
+                if not jobs:
+                    if options['once']:
+                        break
+                    stop.wait(options['interval'])
+                    continue
+
+                for job in jobs:
+                    if run_job(job, JOBS):
+                        self.stdout.write(self.style.SUCCESS(f'{job}: аяқталды'))
+                    else:
+                        self.stdout.write(self.style.ERROR(f'{job}: қате ({job.attempts}/{job.max_attempts})'))
+        finally:
+            connection.close()
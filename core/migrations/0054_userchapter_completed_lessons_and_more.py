@@ -0,0 +1,81 @@
+# Generated by Django 5.2.3 on 2026-10-18 07:46
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value, DecimalField
+from django.db.models.aggregates import Count, Sum
+from django.db.models.functions import Coalesce
+
+
+def _count(queryset):
+    return Coalesce(
+        Subquery(queryset.order_by().values('user_subject').annotate(c=Count('pk')).values('c')),
+        Value(0),
+    )
+
+
+def fill_progress_counters(apps, schema_editor):
+    UserSubject = apps.get_model('core', 'UserSubject')
+    UserChapter = apps.get_model('core', 'UserChapter')
+    UserLesson = apps.get_model('core', 'UserLesson')
+
+    chapter_lessons = UserLesson.objects.filter(
+        user_subject=OuterRef('user_subject'), lesson__chapter=OuterRef('chapter')
+    )
+    UserChapter.objects.update(
+        total_lessons=_count(chapter_lessons),
+        completed_lessons=_count(chapter_lessons.filter(is_completed=True)),
+    )
+
+    subject_lessons = UserLesson.objects.filter(user_subject=OuterRef('pk'))
+    quarter_lessons = subject_lessons.filter(lesson__lesson_type='quarter', is_completed=True)
+    UserSubject.objects.update(
+        total_lessons=_count(subject_lessons),
+        completed_lessons=_count(subject_lessons.filter(is_completed=True)),
+        quarter_count=_count(quarter_lessons),
+        quarter_sum=Coalesce(
+            Subquery(quarter_lessons.order_by().values('user_subject').annotate(s=Sum('percentage')).values('s')),
+            Value(0),
+            output_field=DecimalField(max_digits=7, decimal_places=2),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0053_lesson_lesson_number'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userchapter',
+            name='completed_lessons',
+            field=models.PositiveIntegerField(default=0, verbose_name='Орындалған сабақтар саны'),
+        ),
+        migrations.AddField(
+            model_name='userchapter',
+            name='total_lessons',
+            field=models.PositiveIntegerField(default=0, verbose_name='Сабақтар саны'),
+        ),
+        migrations.AddField(
+            model_name='usersubject',
+            name='completed_lessons',
+            field=models.PositiveIntegerField(default=0, verbose_name='Орындалған сабақтар саны'),
+        ),
+        migrations.AddField(
+            model_name='usersubject',
+            name='quarter_count',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Орындалған ТЖБ саны'),
+        ),
+        migrations.AddField(
+            model_name='usersubject',
+            name='quarter_sum',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=7, verbose_name='ТЖБ пайыздарының қосындысы'),
+        ),
+        migrations.AddField(
+            model_name='usersubject',
+            name='total_lessons',
+            field=models.PositiveIntegerField(default=0, verbose_name='Сабақтар саны'),
+        ),
+        migrations.RunPython(fill_progress_counters, migrations.RunPython.noop),
+    ]
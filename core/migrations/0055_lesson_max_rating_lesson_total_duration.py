@@ -0,0 +1,38 @@
+# Generated by Django 5.2.3 on 2026-10-18 07:48
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.aggregates import Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_lesson_totals(apps, schema_editor):
+    Lesson = apps.get_model('core', 'Lesson')
+    Task = apps.get_model('core', 'Task')
+
+    tasks = Task.objects.filter(lesson=OuterRef('pk')).order_by().values('lesson')
+    Lesson.objects.update(
+        max_rating=Coalesce(Subquery(tasks.annotate(s=Sum('rating')).values('s')), Value(0)),
+        total_duration=Coalesce(Subquery(tasks.annotate(s=Sum('duration')).values('s')), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0054_userchapter_completed_lessons_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='max_rating',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Максималды бағасы'),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='total_duration',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Жалпы уақыты (мин)'),
+        ),
+        migrations.RunPython(fill_lesson_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.2.3 on 2026-10-18 07:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.aggregates import Sum
+
+
+SUM_FIELDS = {'lesson': 'lesson_sum', 'chapter': 'chapter_sum', 'quarter': 'quarter_rating'}
+
+
+def get_mark(total_percent):
+    if total_percent <= 40:
+        return 2
+    elif total_percent <= 65:
+        return 3
+    elif total_percent <= 85:
+        return 4
+    return 5
+
+
+def fill_quarter_grades(apps, schema_editor):
+    Lesson = apps.get_model('core', 'Lesson')
+    UserLesson = apps.get_model('core', 'UserLesson')
+    UserQuarterGrade = apps.get_model('core', 'UserQuarterGrade')
+
+    max_sums = {}
+    for subject_id, quarter, lesson_type, s in (
+        Lesson.objects.values('chapter__subject_id', 'quarter', 'lesson_type').annotate(s=Sum('max_rating'))
+        .values_list('chapter__subject_id', 'quarter', 'lesson_type', 's')
+    ):
+        max_sums.setdefault((subject_id, quarter), {})[lesson_type] = s or 0
+
+    grades = {}
+    for user_subject_id, subject_id, quarter, lesson_type, s in (
+        UserLesson.objects.filter(is_completed=True, lesson__lesson_type__in=SUM_FIELDS)
+        .values('user_subject_id', 'user_subject__subject_id', 'lesson__quarter', 'lesson__lesson_type')
+        .annotate(s=Sum('rating'))
+        .values_list('user_subject_id', 'user_subject__subject_id', 'lesson__quarter', 'lesson__lesson_type', 's')
+    ):
+        grade = grades.setdefault(
+            (user_subject_id, quarter),
+            UserQuarterGrade(user_subject_id=user_subject_id, quarter=quarter)
+        )
+        grade.subject_id = subject_id
+        setattr(grade, SUM_FIELDS[lesson_type], s or 0)
+
+    for grade in grades.values():
+        maxima = max_sums.get((grade.subject_id, grade.quarter), {})
+        max_sum = maxima.get('lesson', 0) + maxima.get('chapter', 0)
+        quarter_max = maxima.get('quarter', 0)
+        fb_bjb_percent = ((grade.lesson_sum + grade.chapter_sum) / max_sum) * 50 if max_sum else 0
+        tjb_percent = (grade.quarter_rating / quarter_max) * 50 if quarter_max else 0
+        total_percent = min(fb_bjb_percent + tjb_percent, 100)
+        grade.fb_bjb_percent = round(fb_bjb_percent, 2)
+        grade.tjb_percent = round(tjb_percent, 2)
+        grade.total_percent = round(total_percent, 2)
+        grade.mark = get_mark(total_percent)
+
+    UserQuarterGrade.objects.bulk_create(grades.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0055_lesson_max_rating_lesson_total_duration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserQuarterGrade',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quarter', models.CharField(choices=[('1', '1-тоқсан'), ('2', '2-тоқсан'), ('3', '3-тоқсан'), ('4', '4-тоқсан')], max_length=16, verbose_name='Тоқсан')),
+                ('lesson_sum', models.PositiveIntegerField(default=0, verbose_name='Формативті бағалар қосындысы')),
+                ('chapter_sum', models.PositiveIntegerField(default=0, verbose_name='БЖБ бағаларының қосындысы')),
+                ('quarter_rating', models.PositiveIntegerField(default=0, verbose_name='ТЖБ бағасы')),
+                ('fb_bjb_percent', models.DecimalField(decimal_places=2, default=0, max_digits=5, verbose_name='ФБ + БЖБ пайызы')),
+                ('tjb_percent', models.DecimalField(decimal_places=2, default=0, max_digits=5, verbose_name='ТЖБ пайызы')),
+                ('total_percent', models.DecimalField(decimal_places=2, default=0, max_digits=5, verbose_name='Жалпы пайыз')),
+                ('mark', models.PositiveSmallIntegerField(default=2, verbose_name='Тоқсандық баға')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Жаңартылған уақыты')),
+                ('user_subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quarter_grades', to='core.usersubject', verbose_name='Қолданушының пәні')),
+            ],
+            options={
+                'verbose_name': 'Қолданушының тоқсандық бағасы',
+                'verbose_name_plural': 'Қолданушының тоқсандық бағалары',
+                'unique_together': {('user_subject', 'quarter')},
+            },
+        ),
+        migrations.RunPython(fill_quarter_grades, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.3 on 2026-10-18 08:13
+
+from django.db import migrations
+from django.db.models import Exists, F, OuterRef
+
+
+# (model, unique fields, order of the rows to keep first), parents before children:
+# deleting a duplicate parent also deletes its own children
+DUPLICATES = (
+    ('UserSubject', ('user', 'subject'), ('-is_completed', '-completed_lessons', 'id')),
+    ('UserChapter', ('user_subject', 'chapter'), ('-is_completed', '-completed_lessons', 'id')),
+    ('UserLesson', ('user_subject', 'lesson'), ('-is_completed', F('started_at').desc(nulls_last=True), 'id')),
+    ('UserTask', ('user_lesson', 'task'), ('-is_completed', '-rating', 'id')),
+    ('UserVideo', ('user_task', 'video'), ('-is_completed', 'id')),
+    ('UserWritten', ('user_task', 'written'), ('-is_submitted', 'id')),
+    ('UserTextGap', ('user_task', 'text_gap'), ('id', )),
+    ('UserAnswer', ('user_task', 'question'), ('id', )),
+    ('UserMatchingAnswer', ('user_task', 'item'), ('id', )),
+)
+BATCH_SIZE = 1000
+
+
+def delete_duplicates(apps, schema_editor):
+    for model_name, fields, keep_order in DUPLICATES:
+        model = apps.get_model('core', model_name)
+        columns = [f'{field}_id' for field in fields]
+        twins = model.objects.filter(**{column: OuterRef(column) for column in columns}).exclude(id=OuterRef('id'))
+
+        kept, duplicate_ids = set(), []
+        for row in (
+            model.objects.filter(Exists(twins)).order_by(*columns, *keep_order).values_list('id', *columns).iterator()
+        ):
+            if row[1:] in kept:
+                duplicate_ids.append(row[0])
+            else:
+                kept.add(row[1:])
+
+        for i in range(0, len(duplicate_ids), BATCH_SIZE):
+            model.objects.filter(id__in=duplicate_ids[i:i + BATCH_SIZE]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0056_userquartergrade'),
+    ]
+
+    # Rows are deleted here, the unique constraints are added in the next migration:
+    # PostgreSQL does not alter a table with pending deferred foreign key checks in the same transaction
+    operations = [
+        migrations.RunPython(delete_duplicates, migrations.RunPython.noop),
+    ]
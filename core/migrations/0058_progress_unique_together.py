@@ -0,0 +1,53 @@
+# Generated by Django 5.2.3 on 2026-10-18 08:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0057_dedupe_progress_rows'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='useranswer',
+            unique_together={('user_task', 'question')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='userchapter',
+            unique_together={('user_subject', 'chapter')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='userlesson',
+            unique_together={('user_subject', 'lesson')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='usermatchinganswer',
+            unique_together={('user_task', 'item')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='usersubject',
+            unique_together={('user', 'subject')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='usertask',
+            unique_together={('user_lesson', 'task')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='usertextgap',
+            unique_together={('user_task', 'text_gap')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='uservideo',
+            unique_together={('user_task', 'video')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='userwritten',
+            unique_together={('user_task', 'written')},
+        ),
+        migrations.AddIndex(
+            model_name='usertask',
+            index=models.Index(fields=['task', 'is_completed'], name='core_userta_task_id_967193_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-18 08:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0058_progress_unique_together'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FanOut',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Күтуде'), ('running', 'Орындалуда'), ('done', 'Аяқталды'), ('failed', 'Қате')], default='pending', max_length=16, verbose_name='Статус')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Барлығы')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='Өңделгені')),
+                ('cursor', models.PositiveBigIntegerField(default=0, verbose_name='Соңғы өңделген id')),
+                ('error', models.TextField(blank=True, verbose_name='Қате')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Құрылған уақыты')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Жаңартылған уақыты')),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fan_outs', to='core.lesson', verbose_name='Сабақ')),
+                ('task', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='fan_outs', to='core.task', verbose_name='Тапсырма')),
+            ],
+            options={
+                'verbose_name': 'Оқушыларға тарату',
+                'verbose_name_plural': 'Оқушыларға таратулар',
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.3 on 2026-10-18 08:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0059_fanout'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, verbose_name='Атауы')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='Параметрлері')),
+                ('status', models.CharField(choices=[('queued', 'Кезекте'), ('running', 'Орындалуда'), ('done', 'Аяқталды'), ('failed', 'Қате')], default='queued', max_length=16, verbose_name='Статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Әрекеттер саны')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=5, verbose_name='Әрекеттердің максималды саны')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Орындалу уақыты')),
+                ('locked_by', models.CharField(blank=True, max_length=128, verbose_name='Орындаушы')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='Алынған уақыты')),
+                ('last_error', models.TextField(blank=True, verbose_name='Соңғы қате')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Құрылған уақыты')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Аяқталған уақыты')),
+            ],
+            options={
+                'verbose_name': 'Фондық тапсырма',
+                'verbose_name_plural': 'Фондық тапсырмалар',
+                'indexes': [models.Index(fields=['status', 'run_at'], name='core_job_status_12af9b_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.3 on 2026-10-18 08:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0060_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='unique_key',
+            field=models.CharField(blank=True, max_length=128, verbose_name='Бірегей кілті'),
+        ),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('unique_key', ''), _negated=True), fields=('unique_key',), name='core_job_unique_key'),
+        ),
+    ]
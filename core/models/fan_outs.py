@@ -0,0 +1,40 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+from core.models import Lesson, Task
+
+
+# FanOut model
+# ----------------------------------------------------------------------------------------------------------------------
+# Creating the per-student rows of a new lesson (or of a new task of a started lesson) for every
+# enrolled student, run in chunks outside of the admin request (core.utils.fan_out)
+class FanOut(models.Model):
+    STATUS = (
+        ('pending', _('Күтуде')),
+        ('running', _('Орындалуда')),
+        ('done', _('Аяқталды')),
+        ('failed', _('Қате')),
+    )
+
+    lesson = models.ForeignKey(
+        Lesson, on_delete=models.CASCADE,
+        verbose_name=_('Сабақ'), related_name='fan_outs'
+    )
+    task = models.ForeignKey(
+        Task, on_delete=models.CASCADE,
+        verbose_name=_('Тапсырма'), related_name='fan_outs', null=True, blank=True
+    )
+    status = models.CharField(_('Статус'), max_length=16, choices=STATUS, default='pending')
+    total = models.PositiveIntegerField(_('Барлығы'), default=0)
+    processed = models.PositiveIntegerField(_('Өңделгені'), default=0)
+    # id of the last processed UserSubject / UserLesson, a retry continues after it
+    cursor = models.PositiveBigIntegerField(_('Соңғы өңделген id'), default=0)
+    error = models.TextField(_('Қате'), blank=True)
+    created_at = models.DateTimeField(_('Құрылған уақыты'), auto_now_add=True)
+    updated_at = models.DateTimeField(_('Жаңартылған уақыты'), auto_now=True)
+
+    def __str__(self):
+        return f'{self.task or self.lesson} | {self.processed}/{self.total}'
+
+    class Meta:
+        verbose_name = _('Оқушыларға тарату')
+        verbose_name_plural = _('Оқушыларға таратулар')
@@ -0,0 +1,43 @@
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+# Job model
+# ----------------------------------------------------------------------------------------------------------------------
+# Background job stored in the database, claimed by `manage.py run_worker` (core.utils.jobs)
+class Job(models.Model):
+    STATUS = (
+        ('queued', _('Кезекте')),
+        ('running', _('Орындалуда')),
+        ('done', _('Аяқталды')),
+        ('failed', _('Қате')),
+    )
+
+    name = models.CharField(_('Атауы'), max_length=64)
+    payload = models.JSONField(_('Параметрлері'), default=dict, blank=True)
+    status = models.CharField(_('Статус'), max_length=16, choices=STATUS, default='queued')
+    attempts = models.PositiveSmallIntegerField(_('Әрекеттер саны'), default=0)
+    max_attempts = models.PositiveSmallIntegerField(_('Әрекеттердің максималды саны'), default=5)
+    run_at = models.DateTimeField(_('Орындалу уақыты'), default=timezone.now)
+    locked_by = models.CharField(_('Орындаушы'), max_length=128, blank=True)
+    locked_at = models.DateTimeField(_('Алынған уақыты'), blank=True, null=True)
+    # enqueue_once: name + payload hash while the job is waiting, cleared when a worker claims it
+    unique_key = models.CharField(_('Бірегей кілті'), max_length=128, blank=True)
+    last_error = models.TextField(_('Соңғы қате'), blank=True)
+    created_at = models.DateTimeField(_('Құрылған уақыты'), auto_now_add=True)
+    finished_at = models.DateTimeField(_('Аяқталған уақыты'), blank=True, null=True)
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
+
+    class Meta:
+        verbose_name = _('Фондық тапсырма')
+        verbose_name_plural = _('Фондық тапсырмалар')
+        # worker: queued jobs that are due
+        indexes = [models.Index(fields=('status', 'run_at'))]
+        constraints = [
+            models.UniqueConstraint(
+                fields=('unique_key', ), condition=~models.Q(unique_key=''), name='core_job_unique_key'
+            ),
+        ]
@@ -1,5 +1,4 @@
 from django.db import models
-from django.db.models.aggregates import Sum
 from django.utils.translation import gettext_lazy as _
 from core.models import User
 
@@ -77,13 +76,13 @@ class Lesson(models.Model):
     lesson_number = models.PositiveIntegerField(_('Сабақтың нөмері'), default=0)
     order = models.PositiveIntegerField(_('Реттілік нөмері'), default=0)
 
+    # Task save/delete сигналдары арқылы жаңартылады
+    max_rating = models.PositiveIntegerField(_('Максималды бағасы'), default=0, editable=False)
+    total_duration = models.PositiveIntegerField(_('Жалпы уақыты (мин)'), default=0, editable=False)
+
     def __str__(self):
         return self.title[:64]
 
-    @property
-    def max_rating(self):
-        return self.tasks.aggregate(total=Sum('rating'))['total'] or 0
-
     class Meta:
         verbose_name = _('Сабақ')
         verbose_name_plural = _('Сабақтар')
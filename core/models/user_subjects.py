@@ -16,6 +16,10 @@ class UserSubject(models.Model):
     )
     rating = models.PositiveSmallIntegerField(_('Жалпы бағасы'), default=0)
     percentage = models.DecimalField(_('Пайыздық мөлшері'), default=0, max_digits=5, decimal_places=2)
+    total_lessons = models.PositiveIntegerField(_('Сабақтар саны'), default=0)
+    completed_lessons = models.PositiveIntegerField(_('Орындалған сабақтар саны'), default=0)
+    quarter_sum = models.DecimalField(_('ТЖБ пайыздарының қосындысы'), default=0, max_digits=7, decimal_places=2)
+    quarter_count = models.PositiveSmallIntegerField(_('Орындалған ТЖБ саны'), default=0)
     is_completed = models.BooleanField(_('Орындалды'), default=False)
     created_at = models.DateTimeField(_('Басталған уақыты'), auto_now_add=True)
     completed_at = models.DateTimeField(_('Орындалған уақыты'), blank=True, null=True)
@@ -23,6 +27,7 @@ class UserSubject(models.Model):
     class Meta:
         verbose_name = _('Қолданушының пәні')
         verbose_name_plural = _('Қолданушының пәндері')
+        unique_together = ('user', 'subject')
 
     def __str__(self):
         return f'{self.user} | {self.subject}'
@@ -45,6 +50,8 @@ class UserChapter(models.Model):
     )
     rating = models.PositiveSmallIntegerField(_('Жалпы бағасы'), default=0)
     percentage = models.DecimalField(_('Пайыздық мөлшері'), default=0, max_digits=5, decimal_places=2)
+    total_lessons = models.PositiveIntegerField(_('Сабақтар саны'), default=0)
+    completed_lessons = models.PositiveIntegerField(_('Орындалған сабақтар саны'), default=0)
     is_completed = models.BooleanField(_('Орындалды'), default=False)
 
     def __str__(self):
@@ -53,6 +60,7 @@ class UserChapter(models.Model):
     class Meta:
         verbose_name = _('Қолданушының пән бөлімі')
         verbose_name_plural = _('Қолданушының пән бөлімдері')
+        unique_together = ('user_subject', 'chapter')
 
 
 # UserLesson model
@@ -85,6 +93,7 @@ class UserLesson(models.Model):
     class Meta:
         verbose_name = _('Қолданушының сабағы')
         verbose_name_plural = _('Қолданушының сабақтары')
+        unique_together = ('user_subject', 'lesson')
 
     def __str__(self):
         return f'{self.user} | {self.lesson}'
@@ -111,6 +120,33 @@ class UserLesson(models.Model):
         }
 
 
+# UserQuarterGrade model
+# ----------------------------------------------------------------------------------------------------------------------
+# Тоқсандық баға: 50% формативті + БЖБ, 50% ТЖБ. Updated every time a lesson of the quarter is finished.
+class UserQuarterGrade(models.Model):
+    user_subject = models.ForeignKey(
+        UserSubject, on_delete=models.CASCADE,
+        related_name='quarter_grades', verbose_name=_('Қолданушының пәні')
+    )
+    quarter = models.CharField(_('Тоқсан'), max_length=16, choices=Lesson.QUARTER)
+    lesson_sum = models.PositiveIntegerField(_('Формативті бағалар қосындысы'), default=0)
+    chapter_sum = models.PositiveIntegerField(_('БЖБ бағаларының қосындысы'), default=0)
+    quarter_rating = models.PositiveIntegerField(_('ТЖБ бағасы'), default=0)
+    fb_bjb_percent = models.DecimalField(_('ФБ + БЖБ пайызы'), default=0, max_digits=5, decimal_places=2)
+    tjb_percent = models.DecimalField(_('ТЖБ пайызы'), default=0, max_digits=5, decimal_places=2)
+    total_percent = models.DecimalField(_('Жалпы пайыз'), default=0, max_digits=5, decimal_places=2)
+    mark = models.PositiveSmallIntegerField(_('Тоқсандық баға'), default=2)
+    updated_at = models.DateTimeField(_('Жаңартылған уақыты'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('Қолданушының тоқсандық бағасы')
+        verbose_name_plural = _('Қолданушының тоқсандық бағалары')
+        unique_together = ('user_subject', 'quarter')
+
+    def __str__(self):
+        return f'{self.user_subject} | {self.quarter}'
+
+
 # Feedback model
 # ----------------------------------------------------------------------------------------------------------------------
 class Feedback(models.Model):
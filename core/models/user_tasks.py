@@ -21,6 +21,9 @@ class UserTask(models.Model):
     class Meta:
         verbose_name = _('Қолданушының тапсырмасы')
         verbose_name_plural = _('Қолданушының тапсырмалары')
+        unique_together = ('user_lesson', 'task')
+        # regrade: completed UserTasks of a task
+        indexes = [models.Index(fields=('task', 'is_completed'))]
 
     def __str__(self):
         return f'{self.user_lesson.user} | {self.task}'
@@ -43,6 +46,7 @@ class UserVideo(models.Model):
     class Meta:
         verbose_name = _('Қолданушының видеосабағы')
         verbose_name_plural = _('Қолданушының видеосабақтары')
+        unique_together = ('user_task', 'video')
 
 
 # UserWritten model
@@ -63,6 +67,7 @@ class UserWritten(models.Model):
     class Meta:
         verbose_name = _('Қолданушының жазбаша жауабы')
         verbose_name_plural = _('Қолданушының жазбаша жауаптары')
+        unique_together = ('user_task', 'written')
 
 
 # UserTextGap model
@@ -82,6 +87,7 @@ class UserTextGap(models.Model):
     class Meta:
         verbose_name = _('Қолданушының сәйкестендіруі')
         verbose_name_plural = _('Қолданушының сәйкестендірулері')
+        unique_together = ('user_task', 'text_gap')
 
 
 # Test model
@@ -101,6 +107,7 @@ class UserAnswer(models.Model):
     class Meta:
         verbose_name = _('Таңдалған жауап')
         verbose_name_plural = _('Таңдалған жауаптар')
+        unique_together = ('user_task', 'question')
 
 
 # UserMatchingAnswer model
@@ -119,13 +126,15 @@ class UserMatchingAnswer(models.Model):
     )
     is_correct = models.BooleanField(_('Дұрыс жауап'), default=False)
 
-    def check_answer(self):
-        self.is_correct = self.item.correct_column_id == self.selected_column_id
-        self.save()
+    # correct_column_id comes from the task answer key, saving is left to the caller (bulk_update)
+    def check_answer(self, correct_column_id):
+        self.is_correct = correct_column_id == self.selected_column_id
+        return self.is_correct
 
     class Meta:
         verbose_name = _('Қолданушының сәйкестендіруі')
         verbose_name_plural = _('Қолданушының сәйкестендірулері')
+        unique_together = ('user_task', 'item')
 
 
 # UserTableAnswer model
@@ -0,0 +1,45 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from core.models import Task, Question, Option, TextGap, MatchingColumn, MatchingItem, TableRow, TableColumn, \
+    TableCell
+from core.utils.answer_keys import invalidate_answer_key
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def invalidate_answer_key_on_task_change(sender, instance, **kwargs):
+    invalidate_answer_key(instance.pk)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+@receiver(post_save, sender=TextGap)
+@receiver(post_delete, sender=TextGap)
+@receiver(post_save, sender=MatchingColumn)
+@receiver(post_delete, sender=MatchingColumn)
+@receiver(post_save, sender=TableRow)
+@receiver(post_delete, sender=TableRow)
+@receiver(post_save, sender=TableColumn)
+@receiver(post_delete, sender=TableColumn)
+def invalidate_answer_key_on_part_change(sender, instance, **kwargs):
+    invalidate_answer_key(instance.task_id)
+
+
+@receiver(post_save, sender=Option)
+@receiver(post_delete, sender=Option)
+def invalidate_answer_key_on_option_change(sender, instance, **kwargs):
+    invalidate_answer_key(Question.objects.filter(pk=instance.question_id).values_list('task_id', flat=True).first())
+
+
+@receiver(post_save, sender=MatchingItem)
+@receiver(post_delete, sender=MatchingItem)
+def invalidate_answer_key_on_matching_item_change(sender, instance, **kwargs):
+    invalidate_answer_key(
+        MatchingColumn.objects.filter(pk=instance.correct_column_id).values_list('task_id', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=TableCell)
+@receiver(post_delete, sender=TableCell)
+def invalidate_answer_key_on_table_cell_change(sender, instance, **kwargs):
+    invalidate_answer_key(TableRow.objects.filter(pk=instance.row_id).values_list('task_id', flat=True).first())
@@ -0,0 +1,27 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from core.models import Subject, Chapter, Lesson
+from core.utils.curriculum import bump_curriculum_version
+from core.utils.progress import queue_quarter_grades_rebuild
+
+
+# Task өзгерістері core.signals.tasks ішінде, Lesson.max_rating жаңартылғаннан кейін ескеріледі.
+# Нұсқа транзакция аяқталғаннан кейін ауысады: әйтпесе қатар сұраныс жаңа нұсқаға ескі деректерді кэштейді
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+@receiver(post_save, sender=Chapter)
+@receiver(post_delete, sender=Chapter)
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def bump_curriculum_version_on_change(sender, instance, **kwargs):
+    transaction.on_commit(bump_curriculum_version)
+
+
+# Сабақтың тоқсаны, түрі немесе өзі өзгерсе, тоқсандық максимумдар да өзгереді
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def rebuild_quarter_grades_on_lesson_change(sender, instance, **kwargs):
+    queue_quarter_grades_rebuild(
+        Chapter.objects.filter(pk=instance.chapter_id).values_list('subject_id', flat=True).first()
+    )
@@ -1,28 +1,27 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from core.models import Lesson, UserSubject, UserChapter, UserLesson
+from core.models import Chapter, Lesson, Task, UserSubject, UserLesson
+from core.utils.fan_out import create_fan_out
+from core.utils.progress import queue_progress_rebuild
 
 
+# UserChapter / UserLesson rows of the enrolled students are created by a background fan-out.
+# A subject nobody is enrolled to yet gets no job, students enrolled later get the lesson from enroll_user
 @receiver(post_save, sender=Lesson)
 def create_user_lessons_on_new_lesson(sender, instance, created, **kwargs):
-    if not created:
-        return
+    if created and UserSubject.objects.filter(subject__chapters=instance.chapter_id).exists():
+        create_fan_out(instance)
 
-    lesson = instance
-    subject = lesson.subject
-    chapter = lesson.chapter
 
-    user_subjects = UserSubject.objects.filter(subject=subject)
+# Students who already started the lesson get the new task and its answer rows
+@receiver(post_save, sender=Task)
+def create_user_tasks_on_new_task(sender, instance, created, **kwargs):
+    if created and UserLesson.objects.filter(lesson_id=instance.lesson_id).exclude(status='no-started').exists():
+        create_fan_out(instance.lesson, instance)
 
-    for user_subject in user_subjects:
-        user_chapter, _ = UserChapter.objects.get_or_create(
-            user=user_subject.user,
-            user_subject=user_subject,
-            chapter=chapter
-        )
 
-        UserLesson.objects.get_or_create(
-            user=user_subject.user,
-            user_subject=user_subject,
-            lesson=lesson
-        )
+# Lesson.subject can be empty, the subject is taken through the chapter like everywhere else.
+# The counters are rebuilt by the worker, not in the admin delete request
+@receiver(post_delete, sender=Lesson)
+def rebuild_progress_counters_on_lesson_delete(sender, instance, **kwargs):
+    queue_progress_rebuild(Chapter.objects.filter(pk=instance.chapter_id).values_list('subject_id', flat=True).first())
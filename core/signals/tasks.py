@@ -0,0 +1,29 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from core.models import Lesson, Task
+from core.utils.curriculum import bump_curriculum_version
+from core.utils.lessons import refresh_lesson_totals
+from core.utils.progress import queue_quarter_grades_rebuild
+
+
+# A task moved to another lesson changes the totals of both lessons, the old lesson is read before the save
+@receiver(pre_save, sender=Task)
+def remember_previous_lesson(sender, instance, **kwargs):
+    instance._previous_lesson_id = (
+        Task.objects.filter(pk=instance.pk).values_list('lesson_id', flat=True).first() if instance.pk else None
+    )
+
+
+# The curriculum version is global and the answer key is versioned by the task id (core.signals.answer_keys),
+# so both are invalidated for the old lesson's subject too
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def refresh_lesson_totals_on_task_change(sender, instance, **kwargs):
+    lesson_ids = {instance.lesson_id, getattr(instance, '_previous_lesson_id', None)} - {None}
+    lessons = Lesson.objects.filter(pk__in=lesson_ids)
+
+    refresh_lesson_totals(lessons)
+    transaction.on_commit(bump_curriculum_version)
+    for subject_id in set(lessons.values_list('chapter__subject_id', flat=True)):
+        queue_quarter_grades_rebuild(subject_id)
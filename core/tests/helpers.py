@@ -0,0 +1,28 @@
+from django.urls import reverse
+from core.models import Task, TextGap, UserChapter, UserLesson, UserTask, UserTextGap
+
+
+# Curriculum / student helpers of the tests
+# ----------------------------------------------------------------------------------------------------------------------
+# text_gap task with one gap per answer
+def create_text_gap_task(lesson, rating, answers):
+    task = Task.objects.create(lesson=lesson, task_type='text_gap', rating=rating, duration=5)
+    gaps = [TextGap.objects.create(task=task, prompt=str(i), correct_answer=answer) for i, answer in enumerate(answers)]
+    return task, gaps
+
+
+# Starts the lesson, submits every text_gap task and finishes the lesson through the student views.
+# answers: the correct answers the student knows, the other gaps are left empty
+def finish_lesson(client, user_subject, lesson, answers):
+    ul = UserLesson.objects.get(user_subject=user_subject, lesson=lesson)
+    uc = UserChapter.objects.get(user_subject=user_subject, chapter=lesson.chapter)
+    kwargs = {'subject_id': user_subject.id, 'chapter_id': uc.id, 'lesson_id': ul.id}
+
+    client.post(reverse('lesson_start', kwargs=kwargs))
+    for ut in UserTask.objects.filter(user_lesson=ul):
+        data = {
+            f'answer_{utg.id}': utg.text_gap.correct_answer if utg.text_gap.correct_answer in answers else ''
+            for utg in UserTextGap.objects.filter(user_task=ut).select_related('text_gap')
+        }
+        client.post(reverse('user_lesson_task', kwargs={**kwargs, 'task_id': ut.id}), data)
+    client.post(reverse('lesson_finish_handler', kwargs=kwargs))
@@ -0,0 +1,137 @@
+from django.test import SimpleTestCase
+from core.grading import CORRECT, ONE_ERROR, PARTIAL, WRONG, grade, grade_batch
+
+
+# Grading engine
+# ----------------------------------------------------------------------------------------------------------------------
+# Pure functions: answers + answer key + full rating -> Grade, no database
+class GradingTestCase(SimpleTestCase):
+    task_type = None
+
+    def assertGrade(self, answers, answer_key, score, outcome, full_rating=10):
+        result = grade(self.task_type, answers, answer_key, full_rating)
+        self.assertEqual((result.score, result.outcome), (score, outcome))
+        self.assertEqual(result.total, len(answers))
+        self.assertEqual(result.correct, sum(result.results.values()))
+        return result
+
+
+class GradeVideoTest(GradingTestCase):
+    task_type = 'video'
+
+    def test_all_watched(self):
+        self.assertGrade({1: True, 2: True}, {}, 10, CORRECT)
+
+    def test_partially_watched(self):
+        self.assertGrade({1: True, 2: False}, {}, 0, PARTIAL)
+
+    def test_empty(self):
+        self.assertGrade({}, {}, 10, CORRECT)
+
+
+class GradeTextGapTest(GradingTestCase):
+    task_type = 'text_gap'
+    answer_key = {1: 'жасуша', 2: 'ядро', 3: 'митоз', 4: 'ген'}
+
+    def test_all_correct_ignores_case_and_spaces(self):
+        self.assertGrade({1: ' Жасуша ', 2: 'ЯДРО', 3: 'митоз', 4: 'ген'}, self.answer_key, 10, CORRECT)
+
+    def test_one_error(self):
+        self.assertGrade({1: 'жасуша', 2: 'ядро', 3: 'мейоз', 4: 'ген'}, self.answer_key, 5, ONE_ERROR)
+
+    def test_half_wrong(self):
+        self.assertGrade({1: 'жасуша', 2: 'ядро', 3: '', 4: None}, self.answer_key, 0, WRONG)
+
+    def test_empty(self):
+        self.assertGrade({}, self.answer_key, 10, CORRECT)
+
+    def test_gaps_without_answer_key(self):
+        result = self.assertGrade({1: 'жасуша', 2: 'ядро'}, {}, 0, WRONG)
+        self.assertEqual(result.correct, 0)
+
+    def test_half_rating_of_one_point(self):
+        self.assertGrade({1: 'жасуша', 2: 'ядро', 3: 'мейоз', 4: 'ген'}, self.answer_key, 0, ONE_ERROR, full_rating=1)
+
+
+class GradeTestTest(GradingTestCase):
+    task_type = 'test'
+    answer_key = {
+        1: ('simple', frozenset({11, 12}), frozenset({11})),
+        2: ('multiple', frozenset({21, 22, 23}), frozenset({21, 22})),
+        3: ('multiple', frozenset({31, 32, 33}), frozenset({31, 33})),
+    }
+
+    def test_all_correct(self):
+        self.assertGrade({1: {11}, 2: {21, 22}, 3: {31, 33}}, self.answer_key, 10, CORRECT)
+
+    def test_one_multiple_error(self):
+        self.assertGrade({1: {11}, 2: {21}, 3: {31, 33}}, self.answer_key, 5, ONE_ERROR)
+
+    def test_simple_error(self):
+        self.assertGrade({1: {12}, 2: {21, 22}, 3: {31, 33}}, self.answer_key, 0, WRONG)
+
+    def test_two_multiple_errors(self):
+        self.assertGrade({1: {11}, 2: {21}, 3: {31}}, self.answer_key, 0, WRONG)
+
+    def test_empty(self):
+        self.assertGrade({}, self.answer_key, 10, CORRECT)
+
+    def test_question_without_correct_options(self):
+        answer_key = {1: ('simple', frozenset({11, 12}), frozenset())}
+        self.assertGrade({1: set()}, answer_key, 10, CORRECT)
+        self.assertGrade({1: {11}}, answer_key, 0, WRONG)
+
+    def test_unknown_question_type(self):
+        answer_key = {**self.answer_key, 4: ('other', frozenset({41}), frozenset({41}))}
+        self.assertGrade({1: {11}, 2: {21, 22}, 3: {31, 33}, 4: set()}, answer_key, 5, PARTIAL)
+
+
+class GradeMatchingTest(GradingTestCase):
+    task_type = 'matching'
+    answer_key = {1: 100, 2: 100, 3: 200, 4: 200}
+
+    def test_all_correct(self):
+        self.assertGrade({1: 100, 2: 100, 3: 200, 4: 200}, self.answer_key, 10, CORRECT)
+
+    def test_one_error(self):
+        self.assertGrade({1: 100, 2: 200, 3: 200, 4: 200}, self.answer_key, 5, ONE_ERROR)
+
+    def test_not_placed_items_are_wrong(self):
+        self.assertGrade({1: 100, 2: None, 3: None, 4: None}, self.answer_key, 0, WRONG)
+
+    def test_empty(self):
+        self.assertGrade({}, self.answer_key, 10, CORRECT)
+
+    def test_items_without_answer_key(self):
+        self.assertGrade({1: 100, 2: 200}, {}, 0, WRONG)
+
+
+class GradeTableTest(GradingTestCase):
+    task_type = 'table'
+    answer_key = {(1, 1): True, (1, 2): False, (2, 1): False, (2, 2): True}
+
+    def test_all_correct(self):
+        self.assertGrade({(1, 1): True, (1, 2): False, (2, 1): False, (2, 2): True}, self.answer_key, 10, CORRECT)
+
+    def test_half_correct(self):
+        self.assertGrade({(1, 1): True, (1, 2): True, (2, 1): True, (2, 2): True}, self.answer_key, 5, PARTIAL)
+
+    def test_mostly_wrong(self):
+        self.assertGrade({(1, 1): False, (1, 2): True, (2, 1): True, (2, 2): True}, self.answer_key, 0, WRONG)
+
+    def test_empty(self):
+        self.assertGrade({}, self.answer_key, 10, CORRECT)
+
+    def test_no_correct_cells(self):
+        answer_key = {(1, 1): False, (1, 2): False}
+        self.assertGrade({(1, 1): False, (1, 2): False}, answer_key, 10, CORRECT)
+
+    def test_zero_rating_counts_as_one(self):
+        self.assertGrade({(1, 1): True, (1, 2): False, (2, 1): False, (2, 2): True}, self.answer_key, 1, CORRECT, 0)
+
+
+class GradeBatchTest(SimpleTestCase):
+    def test_every_submission_is_graded_with_one_key(self):
+        answer_key = {1: 'ядро'}
+        grades = grade_batch('text_gap', answer_key, 4, {10: {1: 'ядро'}, 11: {1: 'жасуша'}})
+        self.assertEqual({user_task_id: g.score for user_task_id, g in grades.items()}, {10: 4, 11: 2})
@@ -0,0 +1,126 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from core.models import Job
+from core.utils.jobs import BACKOFF_BASE, enqueue, enqueue_once, claim_jobs, run_job, requeue_stale_jobs
+
+
+def fail(**payload):
+    raise ValueError('boom')
+
+
+# Enqueue / claim
+# ----------------------------------------------------------------------------------------------------------------------
+class ClaimJobsTest(TestCase):
+    def test_due_jobs_are_claimed_once_in_order(self):
+        first = enqueue('regrade', task_ids=[1])
+        second = enqueue('regrade', task_ids=[2])
+        enqueue('regrade', run_at=timezone.now() + timedelta(hours=1), task_ids=[3])
+
+        self.assertEqual([job.pk for job in claim_jobs('a')], [first.pk])
+        self.assertEqual([job.pk for job in claim_jobs('b')], [second.pk])
+        self.assertEqual(claim_jobs('c'), [])
+
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.locked_by, first.attempts), ('running', 'a', 1))
+
+    def test_enqueue_once_while_waiting(self):
+        job = enqueue_once('rebuild_progress', subject_id=1)
+        self.assertEqual(enqueue_once('rebuild_progress', subject_id=1).pk, job.pk)
+        self.assertNotEqual(enqueue_once('rebuild_progress', subject_id=2).pk, job.pk)
+
+        # A claimed job does not count, the data may have changed after it started
+        claim_jobs('a', limit=2)
+        self.assertNotEqual(enqueue_once('rebuild_progress', subject_id=1).pk, job.pk)
+        self.assertEqual(Job.objects.count(), 3)
+
+
+# Run / retry
+# ----------------------------------------------------------------------------------------------------------------------
+class RunJobTest(TestCase):
+    def test_success(self):
+        handler = mock.Mock()
+        enqueue('regrade', task_ids=[1])
+        [job] = claim_jobs('a')
+
+        self.assertTrue(run_job(job, {'regrade': handler}))
+        handler.assert_called_once_with(task_ids=[1])
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertIsNotNone(job.finished_at)
+
+    def test_retry_with_backoff_then_failed(self):
+        job = enqueue('regrade', max_attempts=3, task_ids=[1])
+
+        for attempt, backoff in ((1, BACKOFF_BASE), (2, BACKOFF_BASE * 2)):
+            [claimed] = claim_jobs('a')
+            started = timezone.now()
+            self.assertFalse(run_job(claimed, {'regrade': fail}))
+
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), ('queued', attempt))
+            self.assertIn('ValueError: boom', job.last_error)
+            self.assertAlmostEqual((job.run_at - started).total_seconds(), backoff, delta=5)
+            # not due before the backoff
+            self.assertEqual(claim_jobs('a'), [])
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+
+        [claimed] = claim_jobs('a')
+        self.assertFalse(run_job(claimed, {'regrade': fail}))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 3))
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(claim_jobs('a'), [])
+
+    def test_unknown_job_fails(self):
+        enqueue('unknown', max_attempts=1)
+        [job] = claim_jobs('a')
+        self.assertFalse(run_job(job, {}))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('KeyError', job.last_error)
+
+
+# Stale jobs
+# ----------------------------------------------------------------------------------------------------------------------
+class RequeueStaleJobsTest(TestCase):
+    def test_stale_jobs_are_requeued_or_failed(self):
+        retried = enqueue('regrade', max_attempts=2, task_ids=[1])
+        exhausted = enqueue('regrade', max_attempts=1, task_ids=[2])
+        fresh = enqueue('regrade', task_ids=[3])
+        claim_jobs('a', limit=3)
+        Job.objects.exclude(pk=fresh.pk).update(locked_at=timezone.now() - timedelta(hours=2))
+
+        self.assertEqual(requeue_stale_jobs(timeout=3600), (1, 1))
+
+        retried.refresh_from_db()
+        exhausted.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual((retried.status, retried.locked_by), ('queued', ''))
+        self.assertGreater(retried.run_at, timezone.now())
+        self.assertTrue(retried.last_error)
+        self.assertEqual(exhausted.status, 'failed')
+        self.assertIsNotNone(exhausted.finished_at)
+        self.assertEqual(fresh.status, 'running')
+
+
+# run_worker command
+# ----------------------------------------------------------------------------------------------------------------------
+# TransactionTestCase: the worker threads use their own database connections
+class RunWorkerTest(TransactionTestCase):
+    def test_once_runs_queued_jobs(self):
+        job = enqueue('rebuild_progress', subject_id=1)
+        call_command('run_worker', once=True, stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+
+    def test_once_exits_on_database_error(self):
+        out = StringIO()
+        with mock.patch('core.management.commands.run_worker.claim_jobs', side_effect=DatabaseError('down')) as claim:
+            call_command('run_worker', once=True, threads=2, stdout=out)
+        self.assertEqual(claim.call_count, 2)
+        self.assertIn('down', out.getvalue())
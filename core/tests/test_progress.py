@@ -0,0 +1,67 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from core.models import User, Subject, Chapter, Lesson, UserSubject, UserQuarterGrade
+from core.tests.helpers import create_text_gap_task, finish_lesson
+from core.utils.enrollment import enroll_user
+from core.utils.progress import get_quarter_mark, rebuild_quarter_grades
+
+
+# Quarter grades
+# ----------------------------------------------------------------------------------------------------------------------
+# Finishing lessons moves the stored quarter grades with F() updates, a full rebuild must give the same grades
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class QuarterGradeTest(TestCase):
+    # (quarter, chapter, lesson_type, task rating, gaps, gaps the student knows)
+    LESSONS = (
+        ('1', 0, 'lesson', 10, 2, 2),
+        ('1', 0, 'lesson', 6, 4, 3),
+        ('1', 0, 'chapter', 8, 4, 2),
+        ('1', 0, 'quarter', 20, 3, 2),
+        ('2', 1, 'lesson', 10, 2, 1),
+        ('2', 1, 'lesson', 4, 1, 1),
+        ('2', 1, 'chapter', 10, 4, 4),
+        ('2', 1, 'quarter', 20, 2, 0),
+    )
+
+    def setUp(self):
+        # Task ids start again in every test, their answer key versions must too
+        cache.clear()
+        teacher = User.objects.create_user('teacher', password='x', user_type='teacher')
+        student = User.objects.create_user('student', password='x', user_type='student', user_class='8b')
+        subject = Subject.objects.create(name='Биология', owner=teacher)
+        chapters = [Chapter.objects.create(subject=subject, name=f'Бөлім {i}', order=i) for i in range(2)]
+
+        self.lessons = []
+        for order, (quarter, chapter, lesson_type, rating, gaps, known) in enumerate(self.LESSONS):
+            lesson = Lesson.objects.create(
+                subject=subject, chapter=chapters[chapter], title=f'Сабақ {order}', order=order,
+                lesson_type=lesson_type, quarter=quarter,
+            )
+            answers = [f'жауап {order}.{i}' for i in range(gaps)]
+            create_text_gap_task(lesson, rating, answers)
+            self.lessons.append((lesson, set(answers[:known])))
+
+        self.user_subject = enroll_user(subject, student)
+        self.client.force_login(student)
+
+    def grades(self):
+        return {
+            grade.quarter: (
+                grade.lesson_sum, grade.chapter_sum, grade.quarter_rating,
+                grade.fb_bjb_percent, grade.tjb_percent, grade.total_percent, grade.mark,
+            )
+            for grade in UserQuarterGrade.objects.filter(user_subject=self.user_subject)
+        }
+
+    def test_incremental_grades_match_rebuild(self):
+        for number, (lesson, answers) in enumerate(self.lessons, 1):
+            finish_lesson(self.client, self.user_subject, lesson, answers)
+
+            incremental = self.grades()
+            rebuild_quarter_grades(UserSubject.objects.filter(pk=self.user_subject.pk))
+            self.assertEqual(self.grades(), incremental, f'after {number} finished lessons')
+
+        self.assertEqual(set(incremental), {'1', '2'})
+        for quarter, (*_, total_percent, mark) in incremental.items():
+            self.assertGreater(total_percent, 0)
+            self.assertEqual(mark, get_quarter_mark(total_percent))
@@ -0,0 +1,79 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from core.jobs import JOBS
+from core.models import User, Subject, Chapter, Lesson, UserSubject, UserLesson, UserTask, UserTextGap, \
+    UserQuarterGrade
+from core.tests.helpers import create_text_gap_task, finish_lesson
+from core.utils.enrollment import enroll_user
+from core.utils.jobs import enqueue, claim_jobs, run_job
+
+
+# Regrade pipeline
+# ----------------------------------------------------------------------------------------------------------------------
+# A student finishes a lesson and the quarter lesson (ТЖБ) through the views, the teacher then corrects
+# the answer key and the 'regrade' job rewrites the stored ratings, percentages, quarter grade and mark
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class RegradeTest(TestCase):
+    def setUp(self):
+        # Task ids start again in every test, their answer key versions must too
+        cache.clear()
+        teacher = User.objects.create_user('teacher', password='x', user_type='teacher')
+        self.student = User.objects.create_user('student', password='x', user_type='student', user_class='8b')
+        self.subject = Subject.objects.create(name='Биология', owner=teacher)
+        chapter = Chapter.objects.create(subject=self.subject, name='Жасуша', order=0)
+
+        self.lesson = Lesson.objects.create(
+            subject=self.subject, chapter=chapter, title='Сабақ', order=0, lesson_type='lesson', quarter='1'
+        )
+        self.task, self.gaps = create_text_gap_task(self.lesson, 10, ['ядро', 'митоз'])
+        quarter_lesson = Lesson.objects.create(
+            subject=self.subject, chapter=chapter, title='ТЖБ', order=1, lesson_type='quarter', quarter='1'
+        )
+        create_text_gap_task(quarter_lesson, 10, ['ген'])
+
+        self.user_subject = enroll_user(self.subject, self.student)
+        self.client.force_login(self.student)
+        finish_lesson(self.client, self.user_subject, self.lesson, {'ядро', 'митоз'})
+        finish_lesson(self.client, self.user_subject, quarter_lesson, {'ген'})
+
+    def snapshot(self):
+        ul = UserLesson.objects.get(user_subject=self.user_subject, lesson=self.lesson)
+        grade = UserQuarterGrade.objects.get(user_subject=self.user_subject, quarter='1')
+        return {
+            'user_task': UserTask.objects.get(user_lesson=ul).rating,
+            'user_lesson': (ul.rating, ul.percentage),
+            'quarter_grade': (grade.lesson_sum, grade.total_percent, grade.mark),
+            'subject_mark': UserSubject.objects.get(pk=self.user_subject.pk).rating,
+        }
+
+    def regrade(self):
+        enqueue('regrade', task_ids=[self.task.id])
+        [job] = claim_jobs('test')
+        self.assertTrue(run_job(job, JOBS))
+
+    def test_changed_answer_key_is_regraded(self):
+        self.assertEqual(self.snapshot(), {
+            'user_task': 10,
+            'user_lesson': (10, 100),
+            'quarter_grade': (10, 100, 5),
+            'subject_mark': 5,
+        })
+
+        gap = self.gaps[1]
+        gap.correct_answer = 'мейоз'
+        with self.captureOnCommitCallbacks(execute=True):
+            gap.save()
+        self.regrade()
+
+        regraded = self.snapshot()
+        self.assertEqual(regraded, {
+            'user_task': 5,
+            'user_lesson': (5, 50),
+            'quarter_grade': (5, 75, 4),
+            'subject_mark': 4,
+        })
+        self.assertFalse(UserTextGap.objects.get(text_gap=gap).is_correct)
+
+        # Nothing changed since: the second run keeps every value
+        self.regrade()
+        self.assertEqual(self.snapshot(), regraded)
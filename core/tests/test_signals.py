@@ -0,0 +1,63 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from core.models import FanOut, Job, User, Subject, Chapter, Lesson, Task, UserLesson
+from core.utils.enrollment import enroll_user
+
+
+# Curriculum signals
+# ----------------------------------------------------------------------------------------------------------------------
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TaskMovedTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        teacher = User.objects.create_user('teacher', password='x', user_type='teacher')
+        self.lessons = []
+        for number in range(2):
+            subject = Subject.objects.create(name=f'Пән {number}', owner=teacher)
+            chapter = Chapter.objects.create(subject=subject, name='Бөлім', order=0)
+            self.lessons.append(Lesson.objects.create(
+                subject=subject, chapter=chapter, title='Сабақ', order=0, lesson_type='lesson', quarter='1'
+            ))
+        self.task = Task.objects.create(lesson=self.lessons[0], task_type='text_gap', rating=10, duration=5)
+        Task.objects.create(lesson=self.lessons[1], task_type='text_gap', rating=4, duration=2)
+        Job.objects.all().delete()
+
+    # Moving a task refreshes the totals of the old lesson too and rebuilds the quarter grades of both subjects
+    def test_old_and_new_lessons_are_refreshed(self):
+        self.task.lesson = self.lessons[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.save()
+
+        totals = {lesson.pk: (lesson.max_rating, lesson.total_duration) for lesson in Lesson.objects.all()}
+        self.assertEqual(totals, {self.lessons[0].pk: (0, 0), self.lessons[1].pk: (14, 7)})
+        self.assertEqual(
+            {job.payload['subject_id'] for job in Job.objects.filter(name='rebuild_quarter_grades')},
+            {lesson.chapter.subject_id for lesson in self.lessons},
+        )
+
+
+class LessonFanOutTest(TestCase):
+    def setUp(self):
+        teacher = User.objects.create_user('teacher', password='x', user_type='teacher')
+        self.student = User.objects.create_user('student', password='x', user_type='student', user_class='8b')
+        self.subject = Subject.objects.create(name='Биология', owner=teacher)
+        self.chapter = Chapter.objects.create(subject=self.subject, name='Жасуша', order=0)
+
+    def create_lesson(self, order):
+        return Lesson.objects.create(
+            subject=self.subject, chapter=self.chapter, title=f'Сабақ {order}', order=order,
+            lesson_type='lesson', quarter='1',
+        )
+
+    # Curriculum authored before anyone is enrolled queues nothing, enrollment creates the rows itself
+    def test_no_fan_out_without_enrolled_students(self):
+        self.create_lesson(0)
+        self.assertFalse(FanOut.objects.exists())
+        self.assertFalse(Job.objects.exists())
+
+        enroll_user(self.subject, self.student)
+        self.assertEqual(UserLesson.objects.filter(user=self.student).count(), 1)
+
+        lesson = self.create_lesson(1)
+        self.assertEqual(FanOut.objects.get().lesson, lesson)
+        self.assertEqual(Job.objects.get().name, 'fan_out')
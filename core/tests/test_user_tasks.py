@@ -0,0 +1,40 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from core.models import User, Subject, Chapter, Lesson, Task, Question, Option, UserLesson, UserAnswer
+from core.utils.enrollment import enroll_user
+from core.utils.user_tasks import materialize_user_tasks
+
+
+# Lesson start rows
+# ----------------------------------------------------------------------------------------------------------------------
+# A repeated start keeps the saved test selections, only a restart of a finished lesson clears them
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class MaterializeTestAnswersTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        teacher = User.objects.create_user('teacher', password='x', user_type='teacher')
+        student = User.objects.create_user('student', password='x', user_type='student', user_class='8b')
+        subject = Subject.objects.create(name='Биология', owner=teacher)
+        chapter = Chapter.objects.create(subject=subject, name='Жасуша', order=0)
+        lesson = Lesson.objects.create(
+            subject=subject, chapter=chapter, title='Сабақ', order=0, lesson_type='lesson', quarter='1'
+        )
+        task = Task.objects.create(lesson=lesson, task_type='test', rating=10, duration=5)
+        question = Question.objects.create(task=task, text='Жасушаның орталығы?')
+        self.option = Option.objects.create(question=question, text='ядро', is_correct=True)
+
+        user_subject = enroll_user(subject, student)
+        self.user_lesson = UserLesson.objects.get(user_subject=user_subject, lesson=lesson)
+
+        materialize_user_tasks(self.user_lesson)
+        self.answer = UserAnswer.objects.get(user_task__user_lesson=self.user_lesson)
+        self.answer.options.set([self.option])
+
+    def test_repeated_start_keeps_selections(self):
+        materialize_user_tasks(self.user_lesson)
+        self.assertEqual(list(self.answer.options.all()), [self.option])
+
+    def test_restart_clears_selections(self):
+        materialize_user_tasks(self.user_lesson, restart=True)
+        self.assertEqual(list(self.answer.options.all()), [])
+        self.assertEqual(UserAnswer.objects.filter(user_task__user_lesson=self.user_lesson).count(), 1)
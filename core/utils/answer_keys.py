@@ -0,0 +1,109 @@
+import time
+from functools import lru_cache, partial
+from types import MappingProxyType
+from django.core.cache import cache
+from django.db import transaction
+from core.models import Question, TextGap, MatchingItem, TableCell
+
+
+ANSWER_KEY_TIMEOUT = 60 * 60 * 24
+
+
+# Answer keys
+# ----------------------------------------------------------------------------------------------------------------------
+# Correct answers of a task, shared by every student:
+#   test:     {question_id: (question_type, frozenset(option_ids), frozenset(correct_option_ids))}
+#   text_gap: {text_gap_id: correct_answer (stripped, lower case)}
+#   matching: {item_id: correct_column_id}
+#   table:    {(row_id, column_id): correct}
+def build_test_key(task_id):
+    key = {}
+    for question_id, question_type, option_id, is_correct in (
+        Question.objects.filter(task_id=task_id)
+        .values_list('id', 'question_type', 'options__id', 'options__is_correct')
+    ):
+        _, option_ids, correct_ids = key.setdefault(question_id, (question_type, set(), set()))
+        if option_id is not None:
+            option_ids.add(option_id)
+        if is_correct:
+            correct_ids.add(option_id)
+    return {
+        question_id: (question_type, frozenset(option_ids), frozenset(correct_ids))
+        for question_id, (question_type, option_ids, correct_ids) in key.items()
+    }
+
+
+def build_text_gap_key(task_id):
+    return {
+        text_gap_id: correct_answer.strip().lower()
+        for text_gap_id, correct_answer in TextGap.objects.filter(task_id=task_id).values_list('id', 'correct_answer')
+    }
+
+
+def build_matching_key(task_id):
+    return dict(MatchingItem.objects.filter(correct_column__task_id=task_id).values_list('id', 'correct_column_id'))
+
+
+def build_table_key(task_id):
+    return {
+        (row_id, column_id): correct
+        for row_id, column_id, correct in (
+            TableCell.objects.filter(row__task_id=task_id).values_list('row_id', 'column_id', 'correct')
+        )
+    }
+
+
+KEY_BUILDERS = {
+    'test': build_test_key,
+    'text_gap': build_text_gap_key,
+    'matching': build_matching_key,
+    'table': build_table_key,
+}
+
+
+# Answer key versions
+# ----------------------------------------------------------------------------------------------------------------------
+# Every task has its own version in the shared cache, the in-process LRU is keyed by (task_id, version)
+def _version_key(task_id):
+    return f'answer_key:version:{task_id}'
+
+
+def get_answer_key_version(task_id):
+    version = cache.get(_version_key(task_id))
+    if version is None:
+        version = time.time_ns()
+        cache.add(_version_key(task_id), version, timeout=None)
+        version = cache.get(_version_key(task_id), version)
+    return version
+
+
+# The new version is written after the current transaction is committed: a submit running before
+# the commit would build the key from the old rows and keep it under the new version.
+# set(timeout=None) instead of incr, which resets the timeout on the file based cache.
+def invalidate_answer_key(task_id):
+    if task_id is None:
+        return
+    transaction.on_commit(partial(_bump_answer_key_version, task_id))
+
+
+def _bump_answer_key_version(task_id):
+    key = _version_key(task_id)
+    cache.set(key, max(cache.get(key, 0) + 1, time.time_ns()), timeout=None)
+
+
+# Answer key getter
+# ----------------------------------------------------------------------------------------------------------------------
+def get_answer_key(task):
+    if task.task_type not in KEY_BUILDERS:
+        return MappingProxyType({})
+    return _get_answer_key(task.id, task.task_type, get_answer_key_version(task.id))
+
+
+@lru_cache(maxsize=512)
+def _get_answer_key(task_id, task_type, version):
+    key = f'answer_key:{task_id}:{version}'
+    answer_key = cache.get(key)
+    if answer_key is None:
+        answer_key = KEY_BUILDERS[task_type](task_id)
+        cache.set(key, answer_key, timeout=ANSWER_KEY_TIMEOUT)
+    return MappingProxyType(answer_key)
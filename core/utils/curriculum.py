@@ -0,0 +1,142 @@
+import time
+from typing import NamedTuple
+from django.core.cache import cache
+from core.models import Chapter, Lesson, Task
+
+
+CURRICULUM_VERSION_KEY = 'curriculum:version'
+CURRICULUM_TIMEOUT = 60 * 60 * 24
+
+
+# Curriculum tree
+# ----------------------------------------------------------------------------------------------------------------------
+# Subject -> Chapter -> Lesson -> Task structure, immutable and cached per subject.
+class CurriculumTask(NamedTuple):
+    id: int
+    lesson_id: int
+    task_type: str
+    rating: int
+    duration: int
+    order: int
+
+    def get_task_type_display(self):
+        return dict(Task.TASK_TYPE).get(self.task_type, self.task_type)
+
+
+class CurriculumLesson(NamedTuple):
+    id: int
+    chapter_id: int
+    title: str
+    lesson_type: str
+    quarter: str
+    lesson_number: int
+    order: int
+    duration: int
+    max_rating: int
+    tasks: tuple
+
+
+class CurriculumChapter(NamedTuple):
+    id: int
+    name: str
+    order: int
+    lessons: tuple
+
+
+class Curriculum(NamedTuple):
+    subject_id: int
+    version: int
+    chapters: tuple
+    lessons: tuple
+
+    def get_lesson(self, lesson_id):
+        return next((lesson for lesson in self.lessons if lesson.id == lesson_id), None)
+
+    # (previous, next) lessons of the subject in curriculum order, None at the ends
+    def get_neighbours(self, lesson_id):
+        for i, lesson in enumerate(self.lessons):
+            if lesson.id == lesson_id:
+                previous_lesson = self.lessons[i - 1] if i > 0 else None
+                next_lesson = self.lessons[i + 1] if i + 1 < len(self.lessons) else None
+                return previous_lesson, next_lesson
+        return None, None
+
+
+# Curriculum version
+# ----------------------------------------------------------------------------------------------------------------------
+def get_curriculum_version():
+    version = cache.get(CURRICULUM_VERSION_KEY)
+    if version is None:
+        # Timestamp, so that an evicted counter never starts again from an already used version
+        version = time.time_ns()
+        cache.add(CURRICULUM_VERSION_KEY, version, timeout=None)
+        version = cache.get(CURRICULUM_VERSION_KEY, version)
+    return version
+
+
+# Written with set(timeout=None), not incr: FileBasedCache.incr is get + set with the default timeout,
+# the version would expire 5 minutes after the change and every subject would be rebuilt.
+def bump_curriculum_version():
+    version = max(cache.get(CURRICULUM_VERSION_KEY, 0) + 1, time.time_ns())
+    cache.set(CURRICULUM_VERSION_KEY, version, timeout=None)
+    return version
+
+
+# Curriculum getter
+# ----------------------------------------------------------------------------------------------------------------------
+def get_curriculum(subject_id):
+    version = get_curriculum_version()
+    key = f'curriculum:{version}:{subject_id}'
+
+    curriculum = cache.get(key)
+    if curriculum is None:
+        curriculum = build_curriculum(subject_id, version)
+        cache.set(key, curriculum, timeout=CURRICULUM_TIMEOUT)
+    return curriculum
+
+
+def build_curriculum(subject_id, version=None):
+    tasks_by_lesson = {}
+    for task in (
+        Task.objects.filter(lesson__chapter__subject_id=subject_id)
+        .order_by('order', 'id')
+        .values_list('id', 'lesson_id', 'task_type', 'rating', 'duration', 'order')
+    ):
+        tasks_by_lesson.setdefault(task[1], []).append(CurriculumTask(*task))
+
+    lessons = tuple(
+        CurriculumLesson(
+            id=lesson['id'],
+            chapter_id=lesson['chapter_id'],
+            title=lesson['title'],
+            lesson_type=lesson['lesson_type'],
+            quarter=lesson['quarter'],
+            lesson_number=lesson['lesson_number'],
+            order=lesson['order'],
+            duration=lesson['total_duration'],
+            max_rating=lesson['max_rating'],
+            tasks=tuple(tasks_by_lesson.get(lesson['id'], ())),
+        )
+        for lesson in (
+            Lesson.objects.filter(chapter__subject_id=subject_id)
+            .order_by('order', 'id')
+            .values(
+                'id', 'chapter_id', 'title', 'lesson_type', 'quarter', 'lesson_number', 'order',
+                'total_duration', 'max_rating',
+            )
+        )
+    )
+
+    chapters = tuple(
+        CurriculumChapter(
+            id=chapter_id,
+            name=name,
+            order=order,
+            lessons=tuple(lesson for lesson in lessons if lesson.chapter_id == chapter_id),
+        )
+        for chapter_id, name, order in (
+            Chapter.objects.filter(subject_id=subject_id).order_by('order', 'id').values_list('id', 'name', 'order')
+        )
+    )
+
+    return Curriculum(subject_id=int(subject_id), version=version, chapters=chapters, lessons=lessons)
@@ -1,6 +1,8 @@
+from django.db.models import F, FilteredRelation, Q
 from django.http import Http404
 from functools import wraps
-from django.shortcuts import redirect
+from django.shortcuts import get_object_or_404, redirect
+from core.models import UserLesson, UserTask
 
 
 def role_required(*allowed_roles):
@@ -22,4 +24,44 @@ def role_required(*allowed_roles):
             raise Http404('Бет табылмады')
 
         return _wrapped_view
-    return decorator
\ No newline at end of file
+    return decorator
+
+
+# Student lesson URLs: .../subject/<subject_id>/chapter/<chapter_id>/lesson/<lesson_id>/[task/<task_id>/]
+# Validates the whole UserSubject -> UserChapter -> UserLesson (-> UserTask) chain of request.user in one query
+# and attaches it to the request: request.user_subject, request.user_chapter, request.user_lesson, request.user_task
+def user_lesson_required(view_func):
+    @wraps(view_func)
+    def _wrapped_view(request, subject_id, chapter_id, lesson_id, *args, **kwargs):
+        task_id = kwargs.get('task_id')
+        if task_id is None:
+            user_task = None
+            user_lesson = get_object_or_404(
+                _with_user_chapter(UserLesson.objects, '').select_related('user_subject', 'lesson', 'user_chapter'),
+                pk=lesson_id, user_subject_id=subject_id, user_subject__user=request.user, user_chapter__pk=chapter_id,
+            )
+        else:
+            user_task = get_object_or_404(
+                _with_user_chapter(UserTask.objects, 'user_lesson__')
+                .select_related('task', 'user_lesson__user_subject', 'user_lesson__lesson', 'user_chapter'),
+                pk=task_id, user_lesson_id=lesson_id, user_lesson__user_subject_id=subject_id,
+                user_lesson__user_subject__user=request.user, user_chapter__pk=chapter_id,
+            )
+            user_lesson = user_task.user_lesson
+            user_lesson.user_chapter = user_task.user_chapter
+
+        request.user_subject = user_lesson.user_subject
+        request.user_chapter = user_lesson.user_chapter
+        request.user_lesson = user_lesson
+        request.user_task = user_task
+        return view_func(request, subject_id, chapter_id, lesson_id, *args, **kwargs)
+
+    return _wrapped_view
+
+
+# UserChapter of the lesson's chapter, joined as "user_chapter"
+def _with_user_chapter(manager, prefix):
+    return manager.annotate(user_chapter=FilteredRelation(
+        f'{prefix}user_subject__user_chapters',
+        condition=Q(**{f'{prefix}user_subject__user_chapters__chapter': F(f'{prefix}lesson__chapter')}),
+    ))
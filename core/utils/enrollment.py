@@ -0,0 +1,73 @@
+from django.db import transaction
+from core.models import User, UserSubject, UserChapter, UserLesson, Lesson
+from core.utils.progress import rebuild_progress_counters
+
+
+BATCH_SIZE = 1000
+
+
+# Enroll users to subject
+# ----------------------------------------------------------------------------------------------------------------------
+# Existing rows are read once, missing ones are inserted with bulk_create.
+# Rows inserted by a concurrent enrollment meanwhile are skipped by the unique constraints.
+# Returns {user_id: UserSubject}
+def enroll_users(subject, users):
+    user_ids = {user.id if isinstance(user, User) else user for user in users}
+    if not user_ids:
+        return {}
+
+    chapters = list(subject.chapters.all())
+    lessons = list(Lesson.objects.filter(chapter__subject=subject).only('id', 'chapter_id'))
+
+    with transaction.atomic():
+        enrolled = set(
+            UserSubject.objects.filter(subject=subject, user_id__in=user_ids).values_list('user_id', flat=True)
+        )
+        UserSubject.objects.bulk_create(
+            [UserSubject(user_id=user_id, subject=subject) for user_id in user_ids - enrolled],
+            batch_size=BATCH_SIZE, ignore_conflicts=True,
+        )
+        user_subjects = {
+            us.user_id: us for us in UserSubject.objects.filter(subject=subject, user_id__in=user_ids)
+        }
+
+        existing_chapters = set(
+            UserChapter.objects.filter(user_subject__in=user_subjects.values())
+            .values_list('user_subject_id', 'chapter_id')
+        )
+        existing_lessons = set(
+            UserLesson.objects.filter(user_subject__in=user_subjects.values())
+            .values_list('user_subject_id', 'lesson_id')
+        )
+
+        UserChapter.objects.bulk_create(
+            [
+                UserChapter(user_id=us.user_id, user_subject=us, chapter=chapter)
+                for us in user_subjects.values()
+                for chapter in chapters
+                if (us.id, chapter.id) not in existing_chapters
+            ],
+            batch_size=BATCH_SIZE, ignore_conflicts=True,
+        )
+        created_lessons = UserLesson.objects.bulk_create(
+            [
+                UserLesson(user_id=us.user_id, user_subject=us, lesson=lesson)
+                for us in user_subjects.values()
+                for lesson in lessons
+                if (us.id, lesson.id) not in existing_lessons
+            ],
+            batch_size=BATCH_SIZE, ignore_conflicts=True,
+        )
+        if created_lessons:
+            rebuild_progress_counters(UserSubject.objects.filter(subject=subject, user_id__in=user_ids))
+
+    return user_subjects
+
+
+def enroll_user(subject, user):
+    return enroll_users(subject, [user])[user.id]
+
+
+def enroll_class(subject, user_class):
+    user_ids = User.objects.filter(user_type='student', user_class=user_class).values_list('id', flat=True)
+    return enroll_users(subject, user_ids)
@@ -0,0 +1,108 @@
+import traceback
+from django.db import transaction
+from django.utils import timezone
+from core.models import FanOut, Job, UserSubject, UserChapter, UserLesson, UserTask
+from core.utils.jobs import enqueue
+from core.utils.progress import rebuild_progress_counters
+from core.utils.revisions import bump_revision
+from core.utils.user_tasks import materialize_user_tasks
+
+
+CHUNK_SIZE = 200
+
+
+# Fan-out handlers
+# ----------------------------------------------------------------------------------------------------------------------
+# Every handler returns (queryset of the rows to process, function processing a chunk of them).
+# Chunks are processed in id order and must be safe to run again after a failure.
+
+# ---------------- new lesson: UserChapter / UserLesson of every enrolled student ----------------
+def lesson_fan_out(fan_out):
+    lesson = fan_out.lesson
+
+    def process(user_subjects):
+        # Rows that already exist are skipped by the unique (user_subject, chapter / lesson) constraints
+        UserChapter.objects.bulk_create(
+            [UserChapter(user_id=us.user_id, user_subject=us, chapter_id=lesson.chapter_id) for us in user_subjects],
+            ignore_conflicts=True,
+        )
+        UserLesson.objects.bulk_create(
+            [UserLesson(user_id=us.user_id, user_subject=us, lesson=lesson) for us in user_subjects],
+            ignore_conflicts=True,
+        )
+        rebuild_progress_counters(UserSubject.objects.filter(id__in=[us.id for us in user_subjects]))
+        for us in user_subjects:
+            bump_revision('user_subject', us.id)
+
+    return UserSubject.objects.filter(subject__chapters=lesson.chapter_id).only('id', 'user_id'), process
+
+
+# ---------------- new task: UserTask and answer rows of the students who already started the lesson ----------------
+def task_fan_out(fan_out):
+    task = fan_out.task
+
+    def process(user_lessons):
+        # UserTasks are materialized with their answer rows in one transaction,
+        # an existing UserTask means the student already has them (and may have answered)
+        done = set(
+            UserTask.objects.filter(task=task, user_lesson__in=user_lessons).values_list('user_lesson_id', flat=True)
+        )
+        for ul in user_lessons:
+            if ul.id not in done:
+                materialize_user_tasks(ul, [task])
+
+    return UserLesson.objects.filter(lesson_id=task.lesson_id).exclude(status='no-started'), process
+
+
+# Run fan-out
+# ----------------------------------------------------------------------------------------------------------------------
+# Processes the remaining chunks, the progress (processed, cursor) is saved with every chunk.
+# Returns False when the fan-out is already done or taken by another runner.
+def run_fan_out(fan_out, statuses=('pending', 'failed')):
+    if not FanOut.objects.filter(pk=fan_out.pk, status__in=statuses).update(status='running', error=''):
+        return False
+    fan_out.refresh_from_db()
+
+    try:
+        rows, process = task_fan_out(fan_out) if fan_out.task_id else lesson_fan_out(fan_out)
+        if not fan_out.cursor:
+            fan_out.total = rows.count()
+            fan_out.save(update_fields=['total', 'updated_at'])
+
+        while True:
+            chunk = list(rows.filter(id__gt=fan_out.cursor).order_by('id')[:CHUNK_SIZE])
+            if not chunk:
+                break
+            with transaction.atomic():
+                process(chunk)
+                fan_out.cursor = chunk[-1].id
+                fan_out.processed += len(chunk)
+                fan_out.save(update_fields=['cursor', 'processed', 'updated_at'])
+    except Exception:
+        fan_out.status = 'failed'
+        fan_out.error = traceback.format_exc()
+        fan_out.save(update_fields=['status', 'error', 'updated_at'])
+        raise
+
+    fan_out.status = 'done'
+    fan_out.save(update_fields=['status', 'updated_at'])
+    return True
+
+
+# Create fan-out
+# ----------------------------------------------------------------------------------------------------------------------
+# Saves the fan-out and queues it for `manage.py run_worker` (core.jobs), the job is visible
+# to the workers once the admin transaction is committed.
+def create_fan_out(lesson, task=None):
+    fan_out = FanOut.objects.create(lesson=lesson, task=task)
+    start_fan_out(fan_out)
+    return fan_out
+
+
+def start_fan_out(fan_out):
+    # A fan-out already in the queue (e.g. waiting for the retry of a failed attempt) is not queued twice
+    jobs = Job.objects.filter(name='fan_out', payload__fan_out_id=fan_out.pk, status__in=('queued', 'running'))
+    if jobs.exists():
+        jobs.filter(status='queued').update(run_at=timezone.now())
+        return
+    enqueue('fan_out', fan_out_id=fan_out.pk)
@@ -0,0 +1,108 @@
+import atexit
+import threading
+import time
+from collections import Counter
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db.models import Model
+from django.utils.text import camel_case_to_spaces
+from core.utils.answer_keys import get_answer_key_version
+from core.utils.curriculum import get_curriculum_version
+from core.utils.revisions import get_revision
+
+
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+# Every cached fragment of the templates, {% fragment %} accepts only these names
+FRAGMENTS = (
+    'lesson_sidebar',
+    'task_description',
+    'test_questions',
+    'test_review',
+    'text_gap_prompts',
+    'text_gap_review',
+    'matching_board',
+    'matching_review',
+    'table_header',
+    'table_body',
+)
+
+# Revision of a model instance in fragment keys, default: core.utils.revisions stamp of the instance.
+# The answer key version of a task already changes with the task and every question, option, gap,
+# matching column / item, table row / column / cell of it.
+REVISIONS = {
+    'task': get_answer_key_version,
+}
+
+
+# Fragment keys
+# ----------------------------------------------------------------------------------------------------------------------
+# Curriculum version + (model, pk, revision) of every model instance in vary_on, other values as they are.
+def get_revision_name(instance):
+    return camel_case_to_spaces(type(instance).__name__).replace(' ', '_')
+
+
+def get_fragment_key(name, vary_on):
+    parts = [get_curriculum_version()]
+    for value in vary_on:
+        if isinstance(value, Model):
+            revision_name = get_revision_name(value)
+            get_instance_revision = REVISIONS.get(revision_name, lambda pk: get_revision(revision_name, pk))
+            parts += [revision_name, value.pk, get_instance_revision(value.pk)]
+        else:
+            parts.append(value)
+    return make_template_fragment_key(f'fragment.{name}', parts)
+
+
+# Hit / miss counters
+# ----------------------------------------------------------------------------------------------------------------------
+# Counted in process memory and added to the shared cache at most once per STATS_FLUSH_INTERVAL,
+# a render never writes to the (file based) cache just to count itself.
+STATS_FLUSH_INTERVAL = 60
+
+_pending = Counter()
+_pending_lock = threading.Lock()
+_flushed_at = time.monotonic()
+
+
+def _counter_key(name, outcome):
+    return f'fragment:stats:{name}:{outcome}'
+
+
+def count_fragment(name, outcome):
+    global _flushed_at
+    with _pending_lock:
+        _pending[name, outcome] += 1
+        if time.monotonic() - _flushed_at < STATS_FLUSH_INTERVAL:
+            return
+        _flushed_at = time.monotonic()
+    flush_fragment_stats()
+
+
+def flush_fragment_stats():
+    with _pending_lock:
+        pending = {_counter_key(name, outcome): count for (name, outcome), count in _pending.items()}
+        _pending.clear()
+    if not pending:
+        return
+    stored = cache.get_many(pending)
+    cache.set_many({key: stored.get(key, 0) + count for key, count in pending.items()}, timeout=None)
+
+
+# {name: (hits, misses)}
+def get_fragment_stats():
+    counters = cache.get_many([_counter_key(name, outcome) for name in FRAGMENTS for outcome in ('hits', 'misses')])
+    return {
+        name: (counters.get(_counter_key(name, 'hits'), 0), counters.get(_counter_key(name, 'misses'), 0))
+        for name in FRAGMENTS
+    }
+
+
+def reset_fragment_stats():
+    with _pending_lock:
+        _pending.clear()
+    cache.delete_many([_counter_key(name, outcome) for name in FRAGMENTS for outcome in ('hits', 'misses')])
+
+
+# The counts of the last interval are not lost when the process stops (e.g. gunicorn worker restart)
+atexit.register(flush_fragment_stats)
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import traceback
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from core.models import Job
+
+
+BACKOFF_BASE = 30            # seconds, doubled after every failed attempt
+BACKOFF_MAX = 60 * 60
+STALE_TIMEOUT = 60 * 60      # a running job not finished in an hour is taken as lost (e.g. killed worker)
+
+
+# Enqueue
+# ----------------------------------------------------------------------------------------------------------------------
+# The job becomes visible to the workers when the current transaction is committed.
+# name: key of core.jobs.JOBS, payload: JSON serializable keyword arguments of the job
+def enqueue(name, run_at=None, max_attempts=5, **payload):
+    return Job.objects.create(
+        name=name, payload=payload, max_attempts=max_attempts, run_at=run_at or timezone.now()
+    )
+
+
+# Not queued again while the same job is still waiting (e.g. a signal of every saved inline row).
+# The unique key constraint skips the insert of a concurrent twin, a job already claimed by
+# a worker does not count: the change may have been made after it read the data.
+def get_unique_key(name, payload):
+    return f'{name}:{hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()}'
+
+
+def enqueue_once(name, **payload):
+    unique_key = get_unique_key(name, payload)
+    Job.objects.bulk_create(
+        [Job(name=name, payload=payload, unique_key=unique_key, run_at=timezone.now())], ignore_conflicts=True
+    )
+    return Job.objects.filter(unique_key=unique_key).first()
+
+
+# Claim
+# ----------------------------------------------------------------------------------------------------------------------
+# Locks due jobs with SELECT ... FOR UPDATE SKIP LOCKED, so concurrent workers never claim the same job
+def claim_jobs(worker, limit=1):
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status='queued', run_at__lte=now)
+            .order_by('run_at', 'id')[:limit]
+        )
+        if jobs:
+            Job.objects.filter(id__in=[job.id for job in jobs]).update(
+                status='running', locked_by=worker, locked_at=now, attempts=F('attempts') + 1, unique_key=''
+            )
+    for job in jobs:
+        job.status, job.locked_by, job.locked_at, job.attempts = 'running', worker, now, job.attempts + 1
+        job.unique_key = ''
+    return jobs
+
+
+# The lost run counts as a failed attempt: a job that keeps killing its worker ends as failed
+def requeue_stale_jobs(timeout=STALE_TIMEOUT):
+    now = timezone.now()
+    stale = Job.objects.filter(status='running', locked_at__lt=now - timedelta(seconds=timeout))
+    error = f'Worker stopped or did not finish the job in {timeout} seconds'
+
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', finished_at=now, last_error=error, locked_by='', locked_at=None
+    )
+    requeued = 0
+    for job in stale.filter(attempts__lt=F('max_attempts')).only('id', 'attempts'):
+        requeued += Job.objects.filter(pk=job.pk, status='running').update(
+            status='queued', run_at=now + timedelta(seconds=get_backoff(job.attempts)), last_error=error,
+            locked_by='', locked_at=None,
+        )
+    return requeued, failed
+
+
+def get_backoff(attempts):
+    return min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+
+
+# Run
+# ----------------------------------------------------------------------------------------------------------------------
+# handlers: {name: function} (core.jobs.JOBS).
+# A failed job is queued again after the backoff until max_attempts, then left as failed.
+def run_job(job, handlers):
+    try:
+        handler = handlers[job.name]
+        handler(**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = 'queued'
+            job.run_at = timezone.now() + timedelta(seconds=get_backoff(job.attempts))
+        else:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+        job.locked_by, job.locked_at = '', None
+        job.save(update_fields=['status', 'run_at', 'last_error', 'finished_at', 'locked_by', 'locked_at'])
+        return False
+
+    job.status = 'done'
+    job.finished_at = timezone.now()
+    job.locked_by, job.locked_at = '', None
+    job.save(update_fields=['status', 'finished_at', 'locked_by', 'locked_at'])
+    return True
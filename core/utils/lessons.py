@@ -0,0 +1,17 @@
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.aggregates import Sum
+from django.db.models.functions import Coalesce
+from core.models import Lesson, Task
+
+
+# Lesson totals
+# ----------------------------------------------------------------------------------------------------------------------
+# Recomputes Lesson.max_rating and Lesson.total_duration from tasks. lessons: Lesson queryset, None for all
+def refresh_lesson_totals(lessons=None):
+    lessons = Lesson.objects.all() if lessons is None else lessons
+    tasks = Task.objects.filter(lesson=OuterRef('pk')).order_by().values('lesson')
+
+    return lessons.update(
+        max_rating=Coalesce(Subquery(tasks.annotate(s=Sum('rating')).values('s')), Value(0)),
+        total_duration=Coalesce(Subquery(tasks.annotate(s=Sum('duration')).values('s')), Value(0)),
+    )
@@ -0,0 +1,251 @@
+from decimal import Decimal
+from functools import partial
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Value, DecimalField
+from django.db.models.aggregates import Count, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from core.models import Lesson, UserSubject, UserChapter, UserLesson, UserQuarterGrade
+from core.utils.curriculum import CURRICULUM_TIMEOUT, get_curriculum_version
+from core.utils.jobs import enqueue_once
+from core.utils.revisions import bump_revision
+
+
+# Progress counters
+# ----------------------------------------------------------------------------------------------------------------------
+def get_percentage(completed, total):
+    return round((completed / total) * 100, 2) if total else 0
+
+
+def get_subject_mark(avg_quarter_percentage):
+    if avg_quarter_percentage < 40:
+        return 2
+    elif avg_quarter_percentage < 65:
+        return 3
+    elif avg_quarter_percentage < 85:
+        return 4
+    return 5
+
+
+# Quarter grades
+# ----------------------------------------------------------------------------------------------------------------------
+# UserQuarterGrade sum field of every lesson type that counts in the quarter grade
+QUARTER_SUM_FIELDS = {
+    'lesson': 'lesson_sum',
+    'chapter': 'chapter_sum',
+    'quarter': 'quarter_rating',
+}
+
+
+def get_quarter_mark(total_percent):
+    if total_percent <= 40:
+        return 2
+    elif total_percent <= 65:
+        return 3
+    elif total_percent <= 85:
+        return 4
+    return 5
+
+
+# {lesson_type: sum of Lesson.max_rating} of one subject quarter.
+# All quarters of the subject come from one grouped query, cached under the curriculum version,
+# which is bumped on every Task/Lesson change.
+def get_quarter_max_sums(subject_id, quarter):
+    key = f'quarter_max:{get_curriculum_version()}:{subject_id}'
+    max_sums = cache.get(key)
+    if max_sums is None:
+        max_sums = {}
+        for lesson_quarter, lesson_type, s in (
+            Lesson.objects.filter(chapter__subject_id=subject_id)
+            .values('quarter', 'lesson_type').annotate(s=Sum('max_rating'))
+            .values_list('quarter', 'lesson_type', 's')
+        ):
+            max_sums.setdefault(lesson_quarter, {})[lesson_type] = s or 0
+        cache.set(key, max_sums, timeout=CURRICULUM_TIMEOUT)
+    return max_sums.get(quarter, {})
+
+
+# 50% - formative (lesson) and БЖБ (chapter) ratings against their maximum, 50% - ТЖБ (quarter) rating
+def set_quarter_percentages(grade, max_sums):
+    max_sum = (max_sums.get('lesson') or 0) + (max_sums.get('chapter') or 0)
+    quarter_max = max_sums.get('quarter') or 0
+
+    fb_bjb_percent = ((grade.lesson_sum + grade.chapter_sum) / max_sum) * 50 if max_sum else 0
+    tjb_percent = (grade.quarter_rating / quarter_max) * 50 if quarter_max else 0
+    total_percent = min(fb_bjb_percent + tjb_percent, 100)
+
+    grade.fb_bjb_percent = round(fb_bjb_percent, 2)
+    grade.tjb_percent = round(tjb_percent, 2)
+    grade.total_percent = round(total_percent, 2)
+    grade.mark = get_quarter_mark(total_percent)
+    return grade
+
+
+# Adds the rating of a finished lesson to its quarter grade. Returns None for lessons outside the quarter grade
+def update_quarter_grade(user_lesson, user_subject):
+    lesson = user_lesson.lesson
+    field = QUARTER_SUM_FIELDS.get(lesson.lesson_type)
+    if field is None:
+        return None
+
+    grade, _ = UserQuarterGrade.objects.get_or_create(user_subject=user_subject, quarter=lesson.quarter)
+    UserQuarterGrade.objects.filter(pk=grade.pk).update(**{field: F(field) + (user_lesson.rating or 0)})
+    grade.refresh_from_db(fields=list(QUARTER_SUM_FIELDS.values()))
+
+    set_quarter_percentages(grade, get_quarter_max_sums(user_subject.subject_id, lesson.quarter))
+    grade.save(update_fields=['fb_bjb_percent', 'tjb_percent', 'total_percent', 'mark', 'updated_at'])
+    return grade
+
+
+# Recounts the quarter grades from finished UserLessons. user_subjects: UserSubject queryset
+def rebuild_quarter_grades(user_subjects):
+    subject_ids = dict(user_subjects.values_list('id', 'subject_id'))
+
+    sums = {}
+    for user_subject_id, quarter, lesson_type, s in (
+        UserLesson.objects.filter(
+            user_subject_id__in=subject_ids, is_completed=True, lesson__lesson_type__in=QUARTER_SUM_FIELDS
+        )
+        .values('user_subject_id', 'lesson__quarter', 'lesson__lesson_type').annotate(s=Sum('rating'))
+        .values_list('user_subject_id', 'lesson__quarter', 'lesson__lesson_type', 's')
+    ):
+        sums.setdefault((user_subject_id, quarter), {})[QUARTER_SUM_FIELDS[lesson_type]] = s or 0
+
+    max_sums = {}
+    for subject_id, quarter, lesson_type, s in (
+        Lesson.objects.filter(chapter__subject_id__in=set(subject_ids.values()))
+        .values('chapter__subject_id', 'quarter', 'lesson_type').annotate(s=Sum('max_rating'))
+        .values_list('chapter__subject_id', 'quarter', 'lesson_type', 's')
+    ):
+        max_sums.setdefault((subject_id, quarter), {})[lesson_type] = s
+
+    # Existing grades without finished lessons any more are reset to zero
+    existing = set(
+        UserQuarterGrade.objects.filter(user_subject_id__in=subject_ids).values_list('user_subject_id', 'quarter')
+    )
+    grades = {}
+    for key in sums.keys() | existing:
+        grade = grades[key] = UserQuarterGrade(user_subject_id=key[0], quarter=key[1])
+        for field in QUARTER_SUM_FIELDS.values():
+            setattr(grade, field, sums.get(key, {}).get(field, 0))
+        set_quarter_percentages(grade, max_sums.get((subject_ids[key[0]], key[1]), {}))
+
+    # Upsert on unique (user_subject, quarter)
+    with transaction.atomic():
+        UserQuarterGrade.objects.bulk_create(
+            grades.values(), batch_size=1000,
+            update_conflicts=True, unique_fields=('user_subject', 'quarter'),
+            update_fields=[
+                *QUARTER_SUM_FIELDS.values(), 'fb_bjb_percent', 'tjb_percent', 'total_percent', 'mark', 'updated_at',
+            ],
+        )
+    return grades
+
+
+# Task ratings and lessons of the subject change the quarter maxima: the stored percentages
+# are recounted by the worker (core.jobs) after the change is committed
+def queue_quarter_grades_rebuild(subject_id):
+    if subject_id is not None:
+        transaction.on_commit(partial(enqueue_once, 'rebuild_quarter_grades', subject_id=subject_id))
+
+
+# Counters and quarter grades of the whole subject, e.g. after lessons are deleted.
+# One job for all the lessons of a deleted chapter / subject (enqueue_once)
+def queue_progress_rebuild(subject_id):
+    if subject_id is not None:
+        transaction.on_commit(partial(enqueue_once, 'rebuild_progress', subject_id=subject_id))
+
+
+# Marks the lesson as finished and moves the chapter/subject counters with F() expressions.
+# Returns False when the lesson had already been completed (e.g. a double submit).
+def complete_user_lesson(user_lesson, user_chapter, user_subject):
+    now = timezone.now()
+
+    with transaction.atomic():
+        updated = UserLesson.objects.filter(pk=user_lesson.pk, is_completed=False).update(
+            rating=user_lesson.rating,
+            percentage=user_lesson.percentage,
+            status='finished',
+            is_completed=True,
+            completed_at=now,
+        )
+        if not updated:
+            return False
+
+        user_lesson.status = 'finished'
+        user_lesson.is_completed = True
+        user_lesson.completed_at = now
+
+        # ТЖБ percentage is the total of the quarter grade
+        quarter_grade = update_quarter_grade(user_lesson, user_subject)
+        if user_lesson.lesson.lesson_type == 'quarter':
+            user_lesson.percentage = quarter_grade.total_percent
+            UserLesson.objects.filter(pk=user_lesson.pk).update(percentage=user_lesson.percentage)
+
+        UserChapter.objects.filter(pk=user_chapter.pk).update(completed_lessons=F('completed_lessons') + 1)
+        subject_counters = {'completed_lessons': F('completed_lessons') + 1}
+        if user_lesson.lesson.lesson_type == 'quarter':
+            subject_counters['quarter_sum'] = F('quarter_sum') + Decimal(str(user_lesson.percentage))
+            subject_counters['quarter_count'] = F('quarter_count') + 1
+        UserSubject.objects.filter(pk=user_subject.pk).update(**subject_counters)
+
+        # ---------------- user_chapter percentages ----------------
+        user_chapter.refresh_from_db(fields=['total_lessons', 'completed_lessons'])
+        user_chapter.percentage = get_percentage(user_chapter.completed_lessons, user_chapter.total_lessons)
+        user_chapter.is_completed = 0 < user_chapter.total_lessons <= user_chapter.completed_lessons
+        user_chapter.save(update_fields=['percentage', 'is_completed'])
+
+        # ---------------- user_subject percentages ----------------
+        user_subject.refresh_from_db(fields=['total_lessons', 'completed_lessons', 'quarter_sum', 'quarter_count'])
+        user_subject.percentage = get_percentage(user_subject.completed_lessons, user_subject.total_lessons)
+        user_subject.is_completed = 0 < user_subject.total_lessons <= user_subject.completed_lessons
+        if user_subject.is_completed:
+            user_subject.completed_at = now
+
+        avg_quarter_percentage = (
+            user_subject.quarter_sum / user_subject.quarter_count if user_subject.quarter_count else 0
+        )
+        user_subject.rating = get_subject_mark(avg_quarter_percentage)
+        user_subject.save(update_fields=['percentage', 'is_completed', 'completed_at', 'rating'])
+
+    bump_revision('user_subject', user_subject.pk)
+    return True
+
+
+# Recounts the counters from UserLesson rows. user_subjects: UserSubject queryset to limit the rebuild
+def rebuild_progress_counters(user_subjects=None):
+    subjects = UserSubject.objects.all() if user_subjects is None else user_subjects
+    chapters = UserChapter.objects.filter(user_subject__in=subjects.values('pk'))
+
+    chapter_lessons = UserLesson.objects.filter(
+        user_subject=OuterRef('user_subject'), lesson__chapter=OuterRef('chapter')
+    )
+    subject_lessons = UserLesson.objects.filter(user_subject=OuterRef('pk'))
+    quarter_lessons = subject_lessons.filter(lesson__lesson_type='quarter', is_completed=True)
+
+    with transaction.atomic():
+        updated = chapters.update(
+            total_lessons=_count(chapter_lessons),
+            completed_lessons=_count(chapter_lessons.filter(is_completed=True)),
+        )
+        updated += subjects.update(
+            total_lessons=_count(subject_lessons),
+            completed_lessons=_count(subject_lessons.filter(is_completed=True)),
+            quarter_count=_count(quarter_lessons),
+            quarter_sum=Coalesce(
+                Subquery(
+                    quarter_lessons.order_by().values('user_subject').annotate(s=Sum('percentage')).values('s')
+                ),
+                Value(0),
+                output_field=DecimalField(max_digits=7, decimal_places=2),
+            ),
+        )
+    return updated
+
+
+def _count(queryset):
+    return Coalesce(
+        Subquery(queryset.order_by().values('user_subject').annotate(c=Count('pk')).values('c')),
+        Value(0),
+    )
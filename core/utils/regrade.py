@@ -0,0 +1,208 @@
+from django.db import transaction
+from django.db.models import Avg, Sum
+from core.grading import GRADERS, grade_batch
+from core.models import UserSubject, UserChapter, UserLesson, UserTask, UserVideo, UserTextGap, UserAnswer, \
+    UserMatchingAnswer, UserTableAnswer
+from core.utils.answer_keys import get_answer_key
+from core.utils.progress import get_percentage, get_subject_mark, rebuild_progress_counters, rebuild_quarter_grades
+from core.utils.revisions import bump_revision
+
+
+CHUNK_SIZE = 500
+
+
+# Submission loaders
+# ----------------------------------------------------------------------------------------------------------------------
+# Every loader reads the answer rows of a chunk of UserTasks in one query (test: two) and returns
+# ({user_task_id: answers for core.grading}, answer rows, (model, item key, field) for rows storing the result)
+def _load_rows(model, user_task_ids, get_key, get_value):
+    rows = list(model.objects.filter(user_task_id__in=user_task_ids))
+    submissions = {user_task_id: {} for user_task_id in user_task_ids}
+    for row in rows:
+        submissions[row.user_task_id][get_key(row)] = get_value(row)
+    return submissions, rows
+
+
+# ---------------- video ----------------
+def load_video(user_task_ids):
+    submissions, _ = _load_rows(UserVideo, user_task_ids, lambda uv: uv.video_id, lambda uv: uv.is_completed)
+    return submissions, [], None
+
+
+# ---------------- text_gap ----------------
+def load_text_gap(user_task_ids):
+    submissions, rows = _load_rows(UserTextGap, user_task_ids, lambda utg: utg.text_gap_id, lambda utg: utg.answer)
+    return submissions, rows, (UserTextGap, lambda utg: utg.text_gap_id, 'is_correct')
+
+
+# ---------------- test ----------------
+def load_test(user_task_ids):
+    answers = list(UserAnswer.objects.filter(user_task_id__in=user_task_ids))
+    selections = {}
+    for answer_id, option_id in (
+        UserAnswer.options.through.objects.filter(useranswer__in=answers).values_list('useranswer_id', 'option_id')
+    ):
+        selections.setdefault(answer_id, set()).add(option_id)
+
+    submissions = {user_task_id: {} for user_task_id in user_task_ids}
+    for ua in answers:
+        submissions[ua.user_task_id][ua.question_id] = selections.get(ua.id, set())
+    return submissions, [], None
+
+
+# ---------------- matching ----------------
+def load_matching(user_task_ids):
+    submissions, rows = _load_rows(
+        UserMatchingAnswer, user_task_ids, lambda answer: answer.item_id, lambda answer: answer.selected_column_id
+    )
+    return submissions, rows, (UserMatchingAnswer, lambda answer: answer.item_id, 'is_correct')
+
+
+# ---------------- table ----------------
+def load_table(user_task_ids):
+    submissions, _ = _load_rows(
+        UserTableAnswer, user_task_ids, lambda ans: (ans.row_id, ans.column_id), lambda ans: ans.checked
+    )
+    return submissions, [], None
+
+
+LOADERS = {
+    'video': load_video,
+    'text_gap': load_text_gap,
+    'test': load_test,
+    'matching': load_matching,
+    'table': load_table,
+}
+
+
+# Regrade tasks
+# ----------------------------------------------------------------------------------------------------------------------
+# Recomputes completed UserTasks of the given tasks (Task queryset) with the current answer keys and ratings,
+# chunk by chunk, then refreshes the lesson/chapter/subject rollups. Returns the number of regraded UserTasks.
+def regrade_tasks(tasks, chunk_size=CHUNK_SIZE):
+    regraded = 0
+    for task in tasks.filter(task_type__in=GRADERS).only('id', 'task_type', 'rating'):
+        answer_key = get_answer_key(task)
+        user_task_ids = list(
+            UserTask.objects.filter(task=task, is_completed=True).order_by('id').values_list('id', flat=True)
+        )
+        for i in range(0, len(user_task_ids), chunk_size):
+            regraded += _regrade_chunk(task, answer_key, user_task_ids[i:i + chunk_size])
+
+    user_lessons = UserLesson.objects.filter(
+        is_completed=True, id__in=UserTask.objects.filter(task__in=tasks).values('user_lesson_id')
+    )
+    refresh_rollups(user_lessons)
+    return regraded
+
+
+def _regrade_chunk(task, answer_key, user_task_ids):
+    submissions, rows, result_field = LOADERS[task.task_type](user_task_ids)
+    grades = grade_batch(task.task_type, answer_key, task.rating, submissions)
+
+    with transaction.atomic():
+        if result_field:
+            model, get_key, field = result_field
+            for row in rows:
+                setattr(row, field, grades[row.user_task_id].results[get_key(row)])
+            model.objects.bulk_update(rows, [field], batch_size=CHUNK_SIZE)
+
+        UserTask.objects.bulk_update(
+            [UserTask(id=user_task_id, rating=result.score) for user_task_id, result in grades.items()],
+            ['rating'], batch_size=CHUNK_SIZE,
+        )
+
+    for user_task_id in grades:
+        bump_revision('user_task', user_task_id)
+    return len(grades)
+
+
+# Rollups
+# ----------------------------------------------------------------------------------------------------------------------
+# Same formulas as lesson_finish_handler, computed with grouped queries for all given
+# completed UserLessons (queryset) and the chapters/subjects they belong to.
+def refresh_rollups(user_lessons):
+    user_subjects = UserSubject.objects.filter(id__in=user_lessons.values('user_subject_id'))
+
+    with transaction.atomic():
+        _refresh_lessons(user_lessons.exclude(lesson__lesson_type='quarter'))
+        _refresh_chapters(user_subjects)
+        # Quarter grades depend on every lesson of the quarter, not only on the regraded ones
+        _refresh_quarters(
+            user_subjects,
+            UserLesson.objects.filter(user_subject__in=user_subjects, lesson__lesson_type='quarter', is_completed=True),
+        )
+        rebuild_progress_counters(user_subjects)
+        _refresh_subjects(user_subjects)
+
+    for user_subject_id in user_subjects.values_list('id', flat=True):
+        bump_revision('user_subject', user_subject_id)
+
+
+def _task_ratings(user_lessons):
+    return dict(
+        UserTask.objects.filter(user_lesson__in=user_lessons)
+        .values('user_lesson_id').annotate(s=Sum('rating')).values_list('user_lesson_id', 's')
+    )
+
+
+def _refresh_lessons(user_lessons):
+    ratings = _task_ratings(user_lessons)
+    user_lessons = list(user_lessons.select_related('lesson').only(
+        'id', 'rating', 'percentage', 'lesson__lesson_type', 'lesson__max_rating'
+    ))
+    for ul in user_lessons:
+        ul.rating = ratings.get(ul.id) or 0
+        if ul.lesson.lesson_type == 'lesson':
+            ul.percentage = int(round(ul.rating * 10))
+        elif ul.lesson.lesson_type == 'chapter':
+            ul.percentage = get_percentage(ul.rating, ul.lesson.max_rating)
+    UserLesson.objects.bulk_update(user_lessons, ['rating', 'percentage'], batch_size=CHUNK_SIZE)
+
+
+# UserChapter.rating: average of the lesson ratings, set once the chapter (БЖБ) lesson is finished
+def _refresh_chapters(user_subjects):
+    lessons = UserLesson.objects.filter(user_subject__in=user_subjects)
+    finished = set(
+        lessons.filter(lesson__lesson_type='chapter', is_completed=True)
+        .values_list('user_subject_id', 'lesson__chapter_id')
+    )
+    averages = {
+        (user_subject_id, chapter_id): avg
+        for user_subject_id, chapter_id, avg in (
+            lessons.filter(lesson__lesson_type='lesson')
+            .values('user_subject_id', 'lesson__chapter_id').annotate(avg=Avg('rating'))
+            .values_list('user_subject_id', 'lesson__chapter_id', 'avg')
+        )
+    }
+
+    user_chapters = [
+        uc for uc in UserChapter.objects.filter(user_subject__in=user_subjects).only('id', 'user_subject_id', 'chapter_id')
+        if (uc.user_subject_id, uc.chapter_id) in finished
+    ]
+    for uc in user_chapters:
+        uc.rating = round(averages.get((uc.user_subject_id, uc.chapter_id)) or 0)
+    UserChapter.objects.bulk_update(user_chapters, ['rating'], batch_size=CHUNK_SIZE)
+
+
+# ТЖБ lessons: rating from the tasks, percentage is the total of the rebuilt quarter grade
+def _refresh_quarters(user_subjects, user_lessons):
+    ratings = _task_ratings(user_lessons)
+    user_lessons = list(user_lessons.select_related('lesson').only(
+        'id', 'user_subject_id', 'rating', 'percentage', 'lesson__quarter'
+    ))
+    for ul in user_lessons:
+        ul.rating = ratings.get(ul.id) or 0
+    UserLesson.objects.bulk_update(user_lessons, ['rating'], batch_size=CHUNK_SIZE)
+
+    grades = rebuild_quarter_grades(user_subjects)
+    for ul in user_lessons:
+        ul.percentage = grades[(ul.user_subject_id, ul.lesson.quarter)].total_percent
+    UserLesson.objects.bulk_update(user_lessons, ['percentage'], batch_size=CHUNK_SIZE)
+
+
+def _refresh_subjects(user_subjects):
+    user_subjects = list(user_subjects.only('id', 'quarter_sum', 'quarter_count', 'rating'))
+    for us in user_subjects:
+        us.rating = get_subject_mark(us.quarter_sum / us.quarter_count if us.quarter_count else 0)
+    UserSubject.objects.bulk_update(user_subjects, ['rating'], batch_size=CHUNK_SIZE)
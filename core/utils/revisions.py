@@ -0,0 +1,29 @@
+import time
+from django.core.cache import cache
+
+
+# Revision stamps
+# ----------------------------------------------------------------------------------------------------------------------
+# Per-object counters in the shared cache, used in the keys of cached fragments of that object.
+# Bumping the revision makes every fragment built from the old one unreachable.
+def _revision_key(name, object_id):
+    return f'revision:{name}:{object_id}'
+
+
+def get_revision(name, object_id):
+    key = _revision_key(name, object_id)
+    revision = cache.get(key)
+    if revision is None:
+        # Timestamp, so that an evicted counter never starts again from an already used revision
+        revision = time.time_ns()
+        cache.add(key, revision, timeout=None)
+        revision = cache.get(key, revision)
+    return revision
+
+
+# Never expires (incr of the file based cache would reset the timeout), and never goes back
+def bump_revision(name, object_id):
+    key = _revision_key(name, object_id)
+    revision = max(cache.get(key, 0) + 1, time.time_ns())
+    cache.set(key, revision, timeout=None)
+    return revision
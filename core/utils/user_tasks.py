@@ -0,0 +1,119 @@
+from django.db import transaction
+from core.models import Video, Written, TextGap, Question, MatchingItem, TableRow, TableColumn, UserTask, \
+    UserVideo, UserWritten, UserTextGap, UserAnswer, UserMatchingAnswer, UserTableAnswer
+from core.utils.revisions import bump_revision
+
+
+# Materialize user tasks
+# ----------------------------------------------------------------------------------------------------------------------
+# Every task type inserts its per-user rows with one bulk_create, rows that already exist are skipped
+# by the unique (user_task, item) constraints, so calling it again for an already started lesson changes nothing.
+# restart=True (a finished lesson started again) also clears the saved test selections of the existing answers.
+def materialize_user_tasks(user_lesson, tasks=None, restart=False):
+    tasks = list(user_lesson.lesson.tasks.all() if tasks is None else tasks)
+    if not tasks:
+        return {}
+
+    with transaction.atomic():
+        user_tasks = _get_or_create_user_tasks(user_lesson, tasks)
+        if restart:
+            _clear_test_selections(user_tasks, tasks)
+
+        tasks_by_type = {}
+        for task in tasks:
+            tasks_by_type.setdefault(task.task_type, []).append(task.id)
+
+        for task_type, task_ids in tasks_by_type.items():
+            materializer = MATERIALIZERS.get(task_type)
+            if materializer:
+                materializer({task_id: user_tasks[task_id] for task_id in task_ids})
+
+    # Answer rows created for tasks added after the lesson was started are not in the cached task fragments yet
+    for user_task in user_tasks.values():
+        bump_revision('user_task', user_task.pk)
+    return user_tasks
+
+
+def _get_or_create_user_tasks(user_lesson, tasks):
+    user_tasks = {ut.task_id: ut for ut in UserTask.objects.filter(user_lesson=user_lesson, task__in=tasks)}
+    missing = [UserTask(user_lesson=user_lesson, task=task) for task in tasks if task.id not in user_tasks]
+    if missing:
+        # A concurrent request may have created some of them meanwhile
+        UserTask.objects.bulk_create(missing, ignore_conflicts=True)
+        user_tasks = {ut.task_id: ut for ut in UserTask.objects.filter(user_lesson=user_lesson, task__in=tasks)}
+    return user_tasks
+
+
+def _clear_test_selections(user_tasks, tasks):
+    test_user_tasks = [user_tasks[task.id] for task in tasks if task.task_type == 'test' and task.id in user_tasks]
+    if test_user_tasks:
+        UserAnswer.options.through.objects.filter(useranswer__user_task__in=test_user_tasks).delete()
+
+
+# user_tasks: {task_id: UserTask}, items: [(task_id, item_id), ...]
+def _bulk_create_missing(model, field, user_tasks, items):
+    model.objects.bulk_create(
+        [model(user_task=user_tasks[task_id], **{f'{field}_id': item_id}) for task_id, item_id in items],
+        ignore_conflicts=True,
+    )
+
+
+# ---------------- video ----------------
+def materialize_video(user_tasks):
+    items = Video.objects.filter(task_id__in=user_tasks).values_list('task_id', 'id')
+    _bulk_create_missing(UserVideo, 'video', user_tasks, items)
+
+
+# ---------------- written ----------------
+def materialize_written(user_tasks):
+    items = Written.objects.filter(task_id__in=user_tasks).values_list('task_id', 'id')
+    _bulk_create_missing(UserWritten, 'written', user_tasks, items)
+
+
+# ---------------- text_gap ----------------
+def materialize_text_gap(user_tasks):
+    items = TextGap.objects.filter(task_id__in=user_tasks).values_list('task_id', 'id')
+    _bulk_create_missing(UserTextGap, 'text_gap', user_tasks, items)
+
+
+# ---------------- test ----------------
+def materialize_test(user_tasks):
+    items = Question.objects.filter(task_id__in=user_tasks).values_list('task_id', 'id')
+    _bulk_create_missing(UserAnswer, 'question', user_tasks, items)
+
+
+# ---------------- matching ----------------
+def materialize_matching(user_tasks):
+    items = MatchingItem.objects.filter(correct_column__task_id__in=user_tasks).values_list(
+        'correct_column__task_id', 'id'
+    )
+    _bulk_create_missing(UserMatchingAnswer, 'item', user_tasks, items)
+
+
+# ---------------- table ----------------
+def materialize_table(user_tasks):
+    rows, columns = {}, {}
+    for task_id, row_id in TableRow.objects.filter(task_id__in=user_tasks).values_list('task_id', 'id'):
+        rows.setdefault(task_id, []).append(row_id)
+    for task_id, column_id in TableColumn.objects.filter(task_id__in=user_tasks).values_list('task_id', 'id'):
+        columns.setdefault(task_id, []).append(column_id)
+
+    UserTableAnswer.objects.bulk_create(
+        [
+            UserTableAnswer(user_task=user_task, row_id=row_id, column_id=column_id)
+            for task_id, user_task in user_tasks.items()
+            for row_id in rows.get(task_id, [])
+            for column_id in columns.get(task_id, [])
+        ],
+        ignore_conflicts=True,
+    )
+
+
+MATERIALIZERS = {
+    'video': materialize_video,
+    'written': materialize_written,
+    'text_gap': materialize_text_gap,
+    'test': materialize_test,
+    'matching': materialize_matching,
+    'table': materialize_table,
+}